@@ -0,0 +1,153 @@
+"""
+Módulo de Agregação em Blocos
+
+Este módulo calcula as somas agrupadas usadas pelos gráficos e pelo sumário executivo
+sem carregar a tabela tratada inteira na memória.
+A tabela é lida em blocos (ou em partições, cada uma em um processo separado); cada bloco
+gera uma soma parcial por grupo, e as somas parciais são combinadas no final.
+Pode ser executado diretamente: python agregacao.py <arquivo .csv ou pasta de partições>
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from sumario import COLUNAS_DIMENSAO, COLUNAS_METRICAS, sumario_executivo
+from grafico import gerar_todos_graficos
+from salvar_dados import salvar_sumario_como_json
+from tratamento_dados import COLUNAS_NUMERICAS
+
+# Número de linhas lidas de cada vez
+TAMANHO_BLOCO_PADRAO = 100_000
+
+# Extensões reconhecidas como partições de uma tabela tratada
+EXTENSOES_PARTICAO = ('.csv', '.csv.gz', '.csv.zst')
+
+
+def agregar_bloco(bloco: pd.DataFrame, agrupamentos: dict[str, list[str]], colunas_soma: list[str]) -> dict[str, pd.DataFrame]:
+    """
+    Calcula as somas parciais de um bloco para cada agrupamento, incluindo a contagem de linhas ('Registros')
+    """
+    colunas = [col for col in colunas_soma if col in bloco.columns]
+
+    # Todas as partições precisam ser agrupadas pelas mesmas chaves, senão as somas parciais não se combinam.
+    # Chaves ausentes são preenchidas como no tratamento de nulos: 0 nas numéricas e 'Não Informado' nas de texto
+    chaves_ausentes = {chave for chaves in agrupamentos.values() for chave in chaves if chave not in bloco.columns}
+    if chaves_ausentes:
+        bloco = bloco.assign(**{chave: 0 if chave in COLUNAS_NUMERICAS else 'Não Informado' for chave in chaves_ausentes})
+
+    parciais = {}
+    for nome, chaves in agrupamentos.items():
+        agrupado = bloco.groupby(chaves, observed=True, dropna=False)
+        parcial = agrupado[colunas].sum()
+        parcial['Registros'] = agrupado.size()
+        parciais[nome] = parcial
+    return parciais
+
+
+def combinar_parciais(parciais: list[dict[str, pd.DataFrame]]) -> dict[str, pd.DataFrame]:
+    """
+    Combina várias somas parciais em uma só, somando novamente por grupo (a soma de somas parciais é exata)
+    """
+    combinados = {}
+    for nome in parciais[0]:
+        tabelas = [parcial[nome] for parcial in parciais]
+        juntas = pd.concat(tabelas)
+        combinados[nome] = juntas.groupby(level=list(range(juntas.index.nlevels)), observed=True, dropna=False).sum()
+    return combinados
+
+
+def _agregar_arquivo(caminho_arquivo: str, agrupamentos: dict[str, list[str]], colunas_soma: list[str], tamanho_bloco: int) -> dict[str, pd.DataFrame]:
+    """
+    Lê um arquivo CSV em blocos, mantendo na memória apenas um bloco e o acumulado das somas parciais
+    """
+    acumulado = None
+    # 'utf-8-sig' é a codificação usada por 'salvar_tabela_como_csv'; a compressão é detectada pela extensão
+    with pd.read_csv(caminho_arquivo, chunksize=tamanho_bloco, encoding='utf-8-sig') as leitor:
+        for bloco in leitor:
+            parcial = agregar_bloco(bloco, agrupamentos, colunas_soma)
+            acumulado = parcial if acumulado is None else combinar_parciais([acumulado, parcial])
+    return acumulado
+
+
+def listar_particoes(caminho: str) -> list[str]:
+    """
+    Retorna os arquivos de uma tabela particionada: o próprio arquivo, ou os arquivos CSV de uma pasta
+    """
+    if os.path.isdir(caminho):
+        return sorted(
+            os.path.join(caminho, nome) for nome in os.listdir(caminho)
+            if nome.lower().endswith(EXTENSOES_PARTICAO)
+        )
+    return [caminho]
+
+
+def agregar_em_blocos(caminho: str, agrupamentos: dict[str, list[str]], colunas_soma: list[str] = None,
+                      tamanho_bloco: int = TAMANHO_BLOCO_PADRAO, max_processos: int = None) -> dict[str, pd.DataFrame]:
+    """
+    Calcula as somas agrupadas de uma tabela em disco (arquivo CSV ou pasta de partições) sem carregá-la inteira.
+    Com várias partições, cada uma é agregada em um processo separado.
+    """
+    if colunas_soma is None:
+        colunas_soma = COLUNAS_METRICAS
+
+    particoes = listar_particoes(caminho)
+    if not particoes:
+        print(f"   - AVISO: Nenhum arquivo encontrado em '{caminho}'.")
+        return None
+
+    print(f"   - Agregando {len(particoes)} arquivo(s) em blocos de {tamanho_bloco} linhas...")
+
+    num_processos = min(max_processos or os.cpu_count() or 1, len(particoes))
+    if num_processos <= 1:
+        parciais = [_agregar_arquivo(particao, agrupamentos, colunas_soma, tamanho_bloco) for particao in particoes]
+    else:
+        with ProcessPoolExecutor(max_workers=num_processos) as executor:
+            tarefas = [executor.submit(_agregar_arquivo, particao, agrupamentos, colunas_soma, tamanho_bloco)
+                       for particao in particoes]
+            parciais = [tarefa.result() for tarefa in tarefas]
+
+    # Arquivos vazios não geram somas parciais
+    parciais = [parcial for parcial in parciais if parcial is not None]
+    if not parciais:
+        return None
+
+    resultado = combinar_parciais(parciais)
+    return {nome: tabela.reset_index() for nome, tabela in resultado.items()}
+
+
+def gerar_graficos_e_sumario_em_blocos(caminho: str, caminho_sumario: str = None,
+                                       tamanho_bloco: int = TAMANHO_BLOCO_PADRAO, max_processos: int = None) -> dict:
+    """
+    Gera os gráficos e o sumário executivo de uma tabela tratada em disco, agregando-a em blocos
+    """
+    print(f"\n--- Agregando em blocos a tabela '{caminho}' ---")
+    try:
+        # Uma única agregação, no nível mais detalhado; gráficos e sumário são derivados dela
+        agregados = agregar_em_blocos(caminho, {'base': COLUNAS_DIMENSAO},
+                                      tamanho_bloco=tamanho_bloco, max_processos=max_processos)
+    except Exception as e:
+        print(f"   - ERRO ao agregar a tabela: {e}")
+        return None
+
+    if agregados is None:
+        return None
+    base = agregados['base']
+
+    # Reagrupa a base (pequena) por empresa e por país para os gráficos
+    gerar_todos_graficos(None, agregados={
+        'Empresa': base.groupby('Empresa', observed=True).sum(numeric_only=True).reset_index(),
+        'País': base.groupby('País', observed=True).sum(numeric_only=True).reset_index(),
+    })
+
+    sumario = sumario_executivo(None, base=base)
+    if sumario is not None and caminho_sumario:
+        salvar_sumario_como_json(sumario, caminho_sumario)
+    return sumario
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python agregacao.py <arquivo .csv ou pasta de partições> [arquivo do sumário .json]")
+        sys.exit(1)
+    gerar_graficos_e_sumario_em_blocos(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
@@ -1,8 +1,20 @@
+import os
+import io
+import sys
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import google.generativeai as genai
 
+# Permite importar os módulos de tratamento que ficam na pasta raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tratamento_dados import pipeline_tratamento
+from validacao_dados import validar_dados
+from salvar_dados import salvar_tabela_como_csv, salvar_tabela_como_parquet
+
 # --- CONFIG GERAL ---
 st.set_page_config(page_title="MC SONAE - Análise de Empresas", layout="wide")
 
@@ -13,6 +25,8 @@ if "is_admin" not in st.session_state:
     st.session_state.is_admin = False
 if "chat" not in st.session_state:
     st.session_state.chat = []
+if "dataset_ativo" not in st.session_state:
+    st.session_state.dataset_ativo = None
 
 # --- FUNÇÃO DE LOGIN ---
 def tela_login():
@@ -55,25 +69,182 @@ if st.session_state.is_admin:
 else:
     st.sidebar.info("Modo Usuário")
 
+# --- UPLOAD CSV ---
+# O arquivo enviado é identificado pelo hash do conteúdo e tratado em segundo plano pelo mesmo
+# pipeline do main.py; o resultado vai para um .parquet, e o dataset só é trocado quando ele fica pronto.
+# Esta seção vem antes da leitura dos dados, para que o envio continue disponível mesmo se o dataset falhar
+PASTA_UPLOADS = "saida/uploads"
+
+@st.cache_resource
+def obter_executor():
+    # Um único worker, compartilhado entre as sessões, para processar os uploads
+    return ThreadPoolExecutor(max_workers=1)
+
+@st.cache_resource
+def obter_tarefas_upload():
+    # Tarefas em andamento, indexadas pelo hash do arquivo; cada tarefa sai do registro ao terminar
+    return {}
+
+# Colunas usadas pelos filtros e KPIs; um dataset sem alguma delas não é ativado
+COLUNAS_DASHBOARD = ["Empresa", "Ano", "Setor", "País", "Receita Total (receita bruta)",
+                     "Lucro Líquido", "Custo Operacional (OPEX)", "Número de Funcionários"]
+
+def caminho_rejeitados_upload(caminho_saida):
+    # As linhas rejeitadas ficam ao lado do .parquet: '<hash>_rejeitados.csv'
+    return caminho_saida.removesuffix(".parquet") + "_rejeitados.csv"
+
+def processar_upload(conteudo, caminho_saida):
+    dados = pd.read_csv(io.BytesIO(conteudo))
+    dados, rejeitados, contadores = validar_dados(dados)
+    if not rejeitados.empty:
+        salvar_tabela_como_csv(rejeitados, caminho_rejeitados_upload(caminho_saida))
+
+    # Só um dataset com linhas válidas e com as colunas do dashboard pode substituir o atual
+    faltantes = [coluna for coluna in COLUNAS_DASHBOARD if coluna not in dados.columns]
+    if faltantes:
+        raise ValueError(f"o arquivo não possui a(s) coluna(s) {', '.join(faltantes)}.")
+    if dados.empty:
+        raise ValueError(f"nenhuma das {contadores['total_de_linhas']} linha(s) passou na validação.")
+
+    dados = pipeline_tratamento(dados, compactar=True)
+    # A escrita é atômica: o .parquet só aparece no disco quando está completo
+    salvar_tabela_como_parquet(dados, caminho_saida)
+    if not os.path.exists(caminho_saida):
+        raise RuntimeError("Falha ao salvar o dataset tratado.")
+    return contadores
+
+@st.fragment(run_every="2s")
+def acompanhar_upload(hash_arquivo):
+    # Verifica periodicamente a tarefa, sem bloquear o restante do dashboard
+    tarefa = obter_tarefas_upload().get(hash_arquivo)
+    if tarefa is None or tarefa.done():
+        st.rerun()
+    st.info("Processando o novo dataset em segundo plano...")
+
+st.sidebar.header("Atualizar Dataset")
+arquivo_csv = st.sidebar.file_uploader("Enviar novo arquivo CSV", type=["csv"])
+if arquivo_csv is not None:
+    # O hash é calculado uma única vez por arquivo enviado, e não a cada interação
+    if st.session_state.get("upload_id") != arquivo_csv.file_id:
+        st.session_state.upload_id = arquivo_csv.file_id
+        st.session_state.upload_hash = hashlib.sha256(arquivo_csv.getvalue()).hexdigest()
+    hash_arquivo = st.session_state.upload_hash
+    caminho_upload = os.path.join(PASTA_UPLOADS, f"{hash_arquivo}.parquet")
+
+    tarefas = obter_tarefas_upload()
+    # Um envio que falhou só é reprocessado quando o arquivo é enviado de novo (o que gera um novo 'file_id')
+    erro_upload = st.session_state.get("upload_erro")
+    envio_com_erro = erro_upload is not None and erro_upload[0] == arquivo_csv.file_id
+    # Um arquivo com o mesmo conteúdo já tratado antes é reaproveitado
+    if hash_arquivo not in tarefas and not os.path.exists(caminho_upload) and not envio_com_erro:
+        tarefas[hash_arquivo] = obter_executor().submit(processar_upload, arquivo_csv.getvalue(), caminho_upload)
+
+    tarefa = tarefas.get(hash_arquivo)
+    if tarefa is not None and tarefa.done():
+        # Tarefas concluídas saem do registro compartilhado: o erro ou os contadores da validação
+        # ficam na sessão, e o dataset tratado já está no .parquet
+        tarefas.pop(hash_arquivo, None)
+        if tarefa.exception() is not None:
+            st.session_state.upload_erro = (arquivo_csv.file_id, str(tarefa.exception()))
+            envio_com_erro = True
+        else:
+            st.session_state.upload_contadores = (hash_arquivo, tarefa.result())
+        tarefa = None
+
+    if envio_com_erro:
+        st.sidebar.error(f"Erro ao carregar o CSV: {st.session_state.upload_erro[1]}")
+    elif os.path.exists(caminho_upload) and tarefa is None:
+        if st.session_state.dataset_ativo != caminho_upload:
+            # Troca o dataset de uma só vez e reinicia o script para refazer os filtros
+            st.session_state.dataset_ativo = caminho_upload
+            st.rerun()
+        st.sidebar.success("Novo dataset carregado!")
+        # Contadores da validação (disponíveis quando o arquivo foi tratado nesta sessão)
+        contadores_upload = st.session_state.get("upload_contadores")
+        if contadores_upload is not None and contadores_upload[0] == hash_arquivo:
+            contadores = contadores_upload[1]
+            st.sidebar.caption(
+                f"{contadores['linhas_rejeitadas']} de {contadores['total_de_linhas']} linha(s) rejeitada(s) na validação."
+            )
+    else:
+        with st.sidebar:
+            acompanhar_upload(hash_arquivo)
+
+    # Linhas rejeitadas, com as regras violadas, também quando o upload foi recusado
+    caminho_rejeitados = caminho_rejeitados_upload(caminho_upload)
+    if tarefa is None and os.path.exists(caminho_rejeitados):
+        with st.sidebar.expander("Linhas rejeitadas na validação"):
+            st.dataframe(pd.read_csv(caminho_rejeitados))
+elif st.session_state.dataset_ativo is not None:
+    # Sem arquivo enviado, volta para o dataset padrão
+    st.session_state.dataset_ativo = None
+    st.rerun()
+
 # --- LER CSV COM CACHE ---
+# Arquivos gerados pelo main.py para o dataset padrão
+CAMINHO_CSV_TRATADO = "saida/empresas_2_tratado.csv"
+CAMINHO_PARQUET_TRATADO = "saida/empresas_2_tratado.parquet"
+CAMINHO_SUMARIO = "saida/empresas_2_sumario.json"
+
+def obter_datas_modificacao(*caminhos):
+    # Data de modificação de cada arquivo (None se não existir), usada na chave dos caches abaixo
+    return tuple(os.path.getmtime(caminho) if os.path.exists(caminho) else None for caminho in caminhos)
+
 @st.cache_data
-def carregar_dados():
+def carregar_dados(caminho_upload=None, datas_modificacao=None):
+    # 'datas_modificacao' (CSV, .parquet) entra na chave do cache, para reler os dados quando o main.py os regravar
+    # Dataset enviado pelo usuário, já tratado em segundo plano e salvo em .parquet
+    if caminho_upload:
+        return pd.read_parquet(caminho_upload)
+
+    # O .parquet (gerado quando o main.py compacta os tipos) já traz categorias e inteiros menores.
+    # Só é usado se for tão recente quanto o CSV, para não carregar uma cópia desatualizada
+    if os.path.exists(CAMINHO_PARQUET_TRATADO) and (
+        not os.path.exists(CAMINHO_CSV_TRATADO) or os.path.getmtime(CAMINHO_PARQUET_TRATADO) >= os.path.getmtime(CAMINHO_CSV_TRATADO)
+    ):
+        try:
+            return pd.read_parquet(CAMINHO_PARQUET_TRATADO)
+        except ImportError:
+            pass
     try:
-        df = pd.read_csv("saida/empresas_2_tratado.csv")
+        df = pd.read_csv(CAMINHO_CSV_TRATADO)
         df["Ano"] = pd.to_numeric(df["Ano"])
         return df
     except FileNotFoundError:
         st.error("Arquivo 'empresas_2_tratado.csv' não encontrado.")
         return pd.DataFrame()
 
-df = carregar_dados()
+df = carregar_dados(
+    st.session_state.dataset_ativo,
+    obter_datas_modificacao(CAMINHO_CSV_TRATADO, CAMINHO_PARQUET_TRATADO),
+)
 if df.empty:
     st.stop()
 
+# --- LER SUMÁRIO PRÉ-CALCULADO (gerado pelo main.py ao lado do CSV tratado) ---
+@st.cache_data
+def carregar_sumario(datas_modificacao):
+    # 'datas_modificacao' (sumário, CSV) entra na chave do cache, para reavaliar quando um dos arquivos for regravado.
+    # Como o .parquet, o sumário só é usado se for tão recente quanto o CSV
+    data_sumario, data_csv = datas_modificacao
+    if data_sumario is None or (data_csv is not None and data_sumario < data_csv):
+        return None
+    try:
+        with open(CAMINHO_SUMARIO, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+sumario = carregar_sumario(obter_datas_modificacao(CAMINHO_SUMARIO, CAMINHO_CSV_TRATADO))
+
 # --- FUNÇÃO PARA RESUMO DO CONTEXTO (IA) ---
 
 # --- FUNÇÃO PARA RESUMO DO CONTEXTO (IA) - VERSÃO COMPLETA (Empresa, Setor, País, Ano) ---
-def resumo_contexto(df_filtrado):
+def resumo_contexto(df_filtrado, detalhado=None):
+    # Se o sumário pré-calculado foi informado, usa a tabela já agrupada por Empresa, Setor, País e Ano
+    if detalhado is not None:
+        df_filtrado = pd.DataFrame(detalhado)
+
     # 1. Cabeçalho com os totais do que está na tela agora
     receita_atual = df_filtrado["Receita Total (receita bruta)"].sum()
     lucro_atual = df_filtrado["Lucro Líquido"].sum()
@@ -84,7 +255,7 @@ def resumo_contexto(df_filtrado):
 
     # 2. Detalhamento linha a linha
     # Agrupamos por TODAS as colunas importantes
-    dados_completo = df_filtrado.groupby(["Empresa", "Setor", "País", "Ano"])[
+    dados_completo = df_filtrado.groupby(["Empresa", "Setor", "País", "Ano"], observed=True)[
         ["Receita Total (receita bruta)", "Lucro Líquido"] # Puxei o Lucro também para a IA ficar mais inteligente
     ].sum().reset_index()
     
@@ -116,7 +287,9 @@ with st.expander("Assistente do Dashboard (IA)", expanded=True):
             try:
                 genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
                 modelo = genai.GenerativeModel("gemini-2.0-flash")
-                contexto = resumo_contexto(df)  
+                # O sumário pré-calculado só vale para o dataset padrão, e não para um upload
+                usar_sumario = sumario and st.session_state.dataset_ativo is None
+                contexto = resumo_contexto(df, sumario["detalhado"] if usar_sumario else None)
                 prompt = f"""
                 Você é um assistente especializado no dashboard financeiro.
                 Baseie suas respostas nos dados abaixo e explique de forma clara, simples e objetiva:
@@ -147,16 +320,6 @@ filial = []
 if "Filial" in df.columns:
     filial = st.sidebar.multiselect("Selecione a(s) filial(ais)", sorted(df["Filial"].unique()))
 
-# --- UPLOAD CSV ---
-st.sidebar.header("Atualizar Dataset")
-arquivo_csv = st.sidebar.file_uploader("Enviar novo arquivo CSV", type=["csv"])
-if arquivo_csv is not None:
-    try:
-        df = pd.read_csv(arquivo_csv)
-        st.sidebar.success("Novo dataset carregado!")
-    except Exception as e:
-        st.sidebar.error(f"Erro ao carregar o CSV: {e}")
-
 # --- APLICA FILTROS ---
 df_filtrado = df.copy()
 if empresa != "Todas":
@@ -248,22 +411,22 @@ st.divider()
 st.subheader("Análises Gráficas")
 tab1, tab2, tab3, tab4 = st.tabs(["Receita por Ano", "Receita por Setor", "Top #5 Empresas", "Lucro por País"])
 with tab1:
-    receita_ano = df_filtrado.groupby("Ano", as_index=False)["Receita Total (receita bruta)"].sum()
+    receita_ano = df_filtrado.groupby("Ano", as_index=False, observed=True)["Receita Total (receita bruta)"].sum()
     fig = px.bar(receita_ano, x="Ano", y="Receita Total (receita bruta)", title="Receita Total por Ano", color="Ano", text_auto=".2s")
     fig.update_layout(xaxis_title=None, yaxis_title="Receita (R$)", showlegend=False)
     st.plotly_chart(fig, use_container_width=True)
 with tab2:
-    receita_setor = df_filtrado.groupby("Setor", as_index=False)["Receita Total (receita bruta)"].sum()
+    receita_setor = df_filtrado.groupby("Setor", as_index=False, observed=True)["Receita Total (receita bruta)"].sum()
     fig = px.bar(receita_setor, x="Setor", y="Receita Total (receita bruta)", title="Receita Total por Setor", color="Setor", text_auto=".2s")
     fig.update_layout(xaxis_title=None, yaxis_title="Receita (R$)", showlegend=False)
     st.plotly_chart(fig, use_container_width=True)
 with tab3:
-    top5 = df_filtrado.groupby("Empresa")["Receita Total (receita bruta)"].sum().nlargest(5).reset_index()
+    top5 = df_filtrado.groupby("Empresa", observed=True)["Receita Total (receita bruta)"].sum().nlargest(5).reset_index()
     fig = px.bar(top5, y="Empresa", x="Receita Total (receita bruta)", orientation="h", title="Top 5 Empresas por Receita", color="Empresa", text_auto=".2s")
     fig.update_layout(xaxis_title="Receita (R$)", yaxis_title=None, showlegend=False)
     st.plotly_chart(fig, use_container_width=True)
 with tab4:
-    lucro_pais = df_filtrado.groupby("País", as_index=False)["Lucro Líquido"].sum()
+    lucro_pais = df_filtrado.groupby("País", as_index=False, observed=True)["Lucro Líquido"].sum()
     fig = px.bar(lucro_pais, x="País", y="Lucro Líquido", title="Lucro Líquido por País", color="País", text_auto=".2s")
     fig.update_layout(xaxis_title=None, yaxis_title="Lucro (R$)", showlegend=False)
     st.plotly_chart(fig, use_container_width=True)
@@ -10,9 +10,10 @@ import os
 import pandas as pd
 import matplotlib.pyplot as plt
 
-def criar_e_salvar_grafico_barras(dados: pd.DataFrame, eixo_x: str, eixo_y: str, titulo: str, pasta_saida: str):
+def criar_e_salvar_grafico_barras(dados: pd.DataFrame, eixo_x: str, eixo_y: str, titulo: str, pasta_saida: str, prefixo: str = ""):
     """
-    Cria e salva um único gráfico de barras como um arquivo de imagem (.png)
+    Cria e salva um único gráfico de barras como um arquivo de imagem (.png).
+    O 'prefixo' é acrescentado ao nome do arquivo, para distinguir gráficos de tabelas diferentes.
     """
     # Se não houver dados, não faz nada.
     if dados is None or dados.empty:
@@ -49,7 +50,7 @@ def criar_e_salvar_grafico_barras(dados: pd.DataFrame, eixo_x: str, eixo_y: str,
         plt.tight_layout()
         
         # Cria um nome de arquivo a partir do título do gráfico
-        nome_arquivo = f"{titulo.lower().replace(' ', '_')}.png"
+        nome_arquivo = f"{prefixo}{titulo.lower().replace(' ', '_')}.png"
         caminho_completo = os.path.join(pasta_saida, nome_arquivo)
         
         # Salva a figura gerada no caminho especificado
@@ -64,12 +65,15 @@ def criar_e_salvar_grafico_barras(dados: pd.DataFrame, eixo_x: str, eixo_y: str,
         print(f"   - ERRO ao gerar o gráfico '{titulo}': {e}")
 
 
-def gerar_todos_graficos(dados: pd.DataFrame):
+def gerar_todos_graficos(dados: pd.DataFrame, agregados: dict = None, prefixo: str = ""):
     """
     Orquestra a criação de todos os gráficos de análise definidos.
+    Se 'agregados' for informado ({'Empresa': ..., 'País': ...}, já somados), os dados não são reagrupados;
+    assim os gráficos podem ser gerados a partir de somas calculadas em blocos (ver módulo 'agregacao').
+    O 'prefixo' é acrescentado ao nome dos arquivos, para que os gráficos de várias tabelas não se sobrescrevam.
     """
     # Se não houver dados, interrompe o processo
-    if dados is None:
+    if dados is None and agregados is None:
         print("\n--- Análise gráfica interrompida: DataFrame está vazio. ---")
         return
 
@@ -80,17 +84,23 @@ def gerar_todos_graficos(dados: pd.DataFrame):
     print(f"\n--- Iniciando geração de gráficos (salvando em '{PASTA_GRAFICOS}') ---")
     
     # Agrupa os dados por empresa e soma os valores numéricos
-    dados_por_empresa = dados.groupby('Empresa').sum(numeric_only=True).reset_index()
+    if agregados is not None:
+        dados_por_empresa = agregados['Empresa']
+    else:
+        dados_por_empresa = dados.groupby('Empresa', observed=True).sum(numeric_only=True).reset_index()
     
     # Chama a função de criação de gráficos para cada análise de empresa
-    criar_e_salvar_grafico_barras(dados_por_empresa, 'Empresa', 'Receita Total (receita bruta)', 'Receita Total por Empresa', PASTA_GRAFICOS)
-    criar_e_salvar_grafico_barras(dados_por_empresa, 'Empresa', 'Lucro Líquido', 'Lucro Líquido por Empresa', PASTA_GRAFICOS)
+    criar_e_salvar_grafico_barras(dados_por_empresa, 'Empresa', 'Receita Total (receita bruta)', 'Receita Total por Empresa', PASTA_GRAFICOS, prefixo)
+    criar_e_salvar_grafico_barras(dados_por_empresa, 'Empresa', 'Lucro Líquido', 'Lucro Líquido por Empresa', PASTA_GRAFICOS, prefixo)
     
     # Agrupa os dados por país e soma os valores numéricos
-    dados_por_pais = dados.groupby('País').sum(numeric_only=True).reset_index()
+    if agregados is not None:
+        dados_por_pais = agregados['País']
+    else:
+        dados_por_pais = dados.groupby('País', observed=True).sum(numeric_only=True).reset_index()
 
     # Chama a função de criação de gráficos para cada análise de país
-    criar_e_salvar_grafico_barras(dados_por_pais, 'País', 'Receita Total (receita bruta)', 'Receita Total por País', PASTA_GRAFICOS)
-    criar_e_salvar_grafico_barras(dados_por_pais, 'País', 'Lucro Líquido', 'Lucro Líquido por País', PASTA_GRAFICOS)
+    criar_e_salvar_grafico_barras(dados_por_pais, 'País', 'Receita Total (receita bruta)', 'Receita Total por País', PASTA_GRAFICOS, prefixo)
+    criar_e_salvar_grafico_barras(dados_por_pais, 'País', 'Lucro Líquido', 'Lucro Líquido por País', PASTA_GRAFICOS, prefixo)
     
     print("--- Geração de gráficos finalizada ---")
\ No newline at end of file
@@ -6,13 +6,16 @@ Este script é o ponto de entrada do programa. Ele é responsável por:
 2. Escanear a pasta de entrada em busca de arquivos para processar
 3. Para cada arquivo encontrado, determinar o tipo de processamento necessário com base na sua extensão
 4. Chamar as funções de processamento específicas para tabelas (.csv, .xlsx) ou para textos (.pdf, .docx)
+5. Encaminhar as tabelas encontradas em documentos .docx e .pdf para o mesmo pipeline de tratamento das tabelas
+6. Validar as tabelas antes do tratamento, separando as linhas rejeitadas em um arquivo próprio
 """
 
 import os
-from manipulacao_arquivo import extrair_tabela, extrair_texto
-from tratamento_dados import pipeline_tratamento
+from manipulacao_arquivo import extrair_tabela, extrair_texto, extrair_conteudo_docx, extrair_conteudo_pdf, extrair_abas_excel
+from tratamento_dados import pipeline_tratamento, normalizar_valores_numericos, normalizar_nome_coluna, MAPA_COLUNAS
+from validacao_dados import validar_dados
 from tratamento_texto import limpar_texto, gerar_estatisticas_texto
-from salvar_dados import salvar_tabela_como_csv, salvar_texto_como_json
+from salvar_dados import salvar_tabela_como_csv, salvar_tabela_como_parquet, salvar_texto_como_json, salvar_sumario_como_json, SUFIXOS_COMPRESSAO
 from sumario import sumario_executivo
 from grafico import gerar_todos_graficos
 
@@ -20,38 +23,162 @@ CAMINHO_BASE_DO_SCRIPT = os.path.dirname(os.path.abspath(__file__))
 PASTA_ENTRADA = os.path.join(CAMINHO_BASE_DO_SCRIPT, "entrada")
 PASTA_SAIDA = os.path.join(CAMINHO_BASE_DO_SCRIPT, "saida")
 
+# Se True, as tabelas encontradas em documentos de texto (.docx, .pdf) são enviadas
+# diretamente para o pipeline de tratamento e salvas como CSV
+ENCAMINHAR_TABELAS_DOCUMENTOS = True
+
+# Formato dos arquivos de texto gerados: 'indentado', 'compacto' ou 'jsonl'
+FORMATO_SAIDA_TEXTO = "indentado"
+
+# Compressão dos arquivos de texto gerados: None, 'gzip' ou 'zstd'
+COMPRESSAO_SAIDA_TEXTO = None
+
+# Compressão dos arquivos CSV tratados: None, 'gzip' ou 'zstd'
+COMPRESSAO_SAIDA_TABELA = None
+
+# Número de linhas escritas por vez nos arquivos CSV grandes
+TAMANHO_BLOCO_CSV = 100_000
+
+# Se True, grava ao lado de cada CSV um arquivo '.sha256' com o checksum do arquivo
+GERAR_CHECKSUM_TABELAS = False
+
+# Se True, compacta os tipos das colunas das tabelas tratadas (categorias e inteiros menores)
+# e salva também uma cópia em .parquet, que preserva esses tipos para o dashboard
+COMPACTAR_TABELAS = True
+
+# Se True, a compactação guarda os valores monetários em float32 em vez de float64
+# (metade da memória, mas com perda de precisão em valores acima de ~16 milhões)
+MONETARIO_FLOAT32 = False
+
+# Se True, as tabelas (.csv, .xlsx e as extraídas de .docx/.pdf) passam pelas regras de validação
+# antes do tratamento; as linhas rejeitadas são salvas em '<nome>_rejeitados.csv'
+VALIDAR_TABELAS = True
+
+# Abas dos arquivos .xlsx que devem ser processadas (None processa todas as abas)
+ABAS_EXCEL = None
+
+# Colunas que uma aba do Excel precisa ter para ser tratada como tabela de empresas
+# (os gráficos são agrupados por elas); abas sem essas colunas são ignoradas
+COLUNAS_OBRIGATORIAS_ABA = ['Empresa', 'País']
+
 
 def processar_arquivo_tabela(caminho_arquivo: str, nome_arquivo: str):
     """
     Executa a pipeline completa para arquivos de tabela (CSV, XLSX).
     """
+    nome_base, extensao = os.path.splitext(nome_arquivo)
+
     # Etapa 1: Extrair os dados brutos da tabela do arquivo
+    if extensao.lower() == '.xlsx':
+        # No Excel, cada aba selecionada é tratada como uma tabela independente
+        abas = extrair_abas_excel(caminho_arquivo, abas=ABAS_EXCEL)
+
+        # Abas auxiliares (notas, legendas...) não seguem o esquema de empresas e são descartadas antes de tudo
+        abas_esquema = {}
+        for nome_aba, dado_bruto in abas.items():
+            colunas_aba = {MAPA_COLUNAS.get(normalizar_nome_coluna(coluna)) for coluna in dado_bruto.columns}
+            faltantes = [coluna for coluna in COLUNAS_OBRIGATORIAS_ABA if coluna not in colunas_aba]
+            if faltantes:
+                print(f"   - Aviso: aba '{nome_aba}' ignorada, pois não possui a(s) coluna(s) {faltantes}.")
+                continue
+            abas_esquema[nome_aba] = dado_bruto
+
+        for nome_aba, dado_bruto in abas_esquema.items():
+            # Com uma única aba de empresas, mantém o nome de saída usado para arquivos CSV (lido pelo dashboard);
+            # com várias, o nome da aba também prefixa os gráficos, para que uma aba não sobrescreva os da outra
+            if len(abas_esquema) == 1:
+                tratar_e_salvar_tabela(dado_bruto, nome_base)
+            else:
+                tratar_e_salvar_tabela(dado_bruto, f"{nome_base}_{nome_aba}", prefixo_graficos=f"{nome_base}_{nome_aba}_")
+        return
+
     dado_bruto = extrair_tabela(caminho_arquivo)
-    
+    tratar_e_salvar_tabela(dado_bruto, nome_base)
+
+
+def tratar_e_salvar_tabela(dado_bruto, nome_base: str, prefixo_graficos: str = ""):
+    """
+    Trata uma tabela já extraída, gera os gráficos, salva o CSV tratado e imprime o sumário.
+    'prefixo_graficos' é acrescentado ao nome dos arquivos dos gráficos.
+    """
     # Se a extração falhar, retorna None e interrompe a função
     if dado_bruto is None:
         return
 
+    # Etapa 1.5: Validar os dados, separando as linhas que violam alguma regra
+    if VALIDAR_TABELAS:
+        dado_bruto, rejeitados, _ = validar_dados(dado_bruto)
+        salvar_rejeitados(rejeitados, nome_base)
+
     # Etapa 2: Aplicar todo o pipeline de tratamento e limpeza dos dados
-    dado_tratado = pipeline_tratamento(dado_bruto)
+    dado_tratado = pipeline_tratamento(dado_bruto, compactar=COMPACTAR_TABELAS, monetario_float32=MONETARIO_FLOAT32)
 
     # Se o tratamento falhar, interrompe a função
     if dado_tratado is None:
         return
         
     # Etapa 3: Gera e salva os gráficos com base nos dados tratados
-    gerar_todos_graficos(dado_tratado)
+    gerar_todos_graficos(dado_tratado, prefixo=prefixo_graficos)
 
-    # Etapa 4: Preparar o nome e o caminho do arquivo de saída
-    nome_base, _ = os.path.splitext(nome_arquivo)
-    nome_saida_csv = f"{nome_base}_tratado.csv"
-    caminho_saida_csv = os.path.join(PASTA_SAIDA, nome_saida_csv)
-    
-    # Etapa 5: Salvar o DataFrame tratado no novo arquivo CSV
-    salvar_tabela_como_csv(dado_tratado, caminho_saida_csv)
+    # Etapas 4 e 5: Salvar o DataFrame tratado no novo arquivo CSV
+    salvar_tabela_tratada(dado_tratado, nome_base)
 
     # Imprime o sumário dos indicadores financeiros
-    sumario_executivo(dado_tratado)
+    sumario = sumario_executivo(dado_tratado)
+
+    # Salva o sumário ao lado da tabela tratada, para que o dashboard não precise recalculá-lo
+    if sumario is not None:
+        salvar_sumario_como_json(sumario, os.path.join(PASTA_SAIDA, f"{nome_base}_sumario.json"))
+
+
+def salvar_rejeitados(rejeitados, nome_base: str):
+    """
+    Salva as linhas rejeitadas pela validação em '<nome>_rejeitados.csv'.
+    Sem rejeições, remove o arquivo de uma execução anterior, para que ele não pareça atual
+    """
+    caminho_rejeitados = os.path.join(PASTA_SAIDA, f"{nome_base}_rejeitados.csv")
+    if not rejeitados.empty:
+        salvar_tabela_como_csv(rejeitados, caminho_rejeitados)
+    elif os.path.exists(caminho_rejeitados):
+        os.remove(caminho_rejeitados)
+
+
+def salvar_tabela_tratada(dado_tratado, nome_base: str):
+    """
+    Monta o caminho do CSV tratado (com o sufixo da compressão, se houver) e salva a tabela,
+    além da cópia em .parquet quando os tipos são compactados
+    """
+    nome_saida_csv = f"{nome_base}_tratado.csv{SUFIXOS_COMPRESSAO.get(COMPRESSAO_SAIDA_TABELA, '')}"
+    caminho_saida_csv = os.path.join(PASTA_SAIDA, nome_saida_csv)
+    salvar_tabela_como_csv(dado_tratado, caminho_saida_csv, compressao=COMPRESSAO_SAIDA_TABELA,
+                           tamanho_bloco=TAMANHO_BLOCO_CSV, gerar_checksum=GERAR_CHECKSUM_TABELAS)
+
+    if COMPACTAR_TABELAS:
+        salvar_tabela_como_parquet(dado_tratado, os.path.join(PASTA_SAIDA, f"{nome_base}_tratado.parquet"))
+
+
+def processar_tabelas_extraidas(tabelas: list, nome_base: str):
+    """
+    Envia as tabelas extraídas de documentos de texto para o pipeline de tratamento e as salva como CSV
+    """
+    for indice, tabela in enumerate(tabelas, start=1):
+        print(f"   - Tratando tabela {indice} de {len(tabelas)} extraída do documento...")
+        # Nos documentos os valores vêm como texto formatado ('1.234.567,89', '€ 2.000'):
+        # normaliza antes do pipeline para que não sejam convertidos em nulos
+        tabela = normalizar_valores_numericos(tabela)
+
+        # Valida a tabela; como nem toda tabela de documento traz todas as colunas do esquema,
+        # a falta de uma coluna obrigatória não rejeita a tabela inteira
+        if VALIDAR_TABELAS:
+            tabela, rejeitados, _ = validar_dados(tabela, exigir_colunas=False)
+            salvar_rejeitados(rejeitados, f"{nome_base}_tabela_{indice}")
+
+        dado_tratado = pipeline_tratamento(tabela, compactar=COMPACTAR_TABELAS, monetario_float32=MONETARIO_FLOAT32)
+
+        if dado_tratado is None:
+            continue
+
+        salvar_tabela_tratada(dado_tratado, f"{nome_base}_tabela_{indice}")
 
 
 def processar_arquivo_texto(caminho_arquivo: str, nome_arquivo: str):
@@ -59,8 +186,19 @@ def processar_arquivo_texto(caminho_arquivo: str, nome_arquivo: str):
     Executa a pipeline completa para arquivos de texto (PDF, DOCX)
     """
     
+    nome_base, extensao = os.path.splitext(nome_arquivo)
+
     # Etapa 1: Extrair o texto do arquivo como uma lista de parágrafos
-    lista_paragrafos_brutos = extrair_texto(caminho_arquivo)
+    if extensao.lower() == '.docx':
+        # Para .docx, lê o XML de forma incremental, obtendo parágrafos e tabelas de uma só vez
+        lista_paragrafos_brutos, tabelas = extrair_conteudo_docx(caminho_arquivo, incluir_tabelas=ENCAMINHAR_TABELAS_DOCUMENTOS)
+        processar_tabelas_extraidas(tabelas, nome_base)
+    elif extensao.lower() == '.pdf':
+        # Para .pdf, detecta as tabelas de cada página e as separa do texto corrido
+        lista_paragrafos_brutos, tabelas = extrair_conteudo_pdf(caminho_arquivo, incluir_tabelas=ENCAMINHAR_TABELAS_DOCUMENTOS)
+        processar_tabelas_extraidas(tabelas, nome_base)
+    else:
+        lista_paragrafos_brutos = extrair_texto(caminho_arquivo)
     
     if not lista_paragrafos_brutos:
         print("   - Falha ao extrair texto ou arquivo sem conteúdo. Pulando para o próximo arquivo.")
@@ -91,12 +229,12 @@ def processar_arquivo_texto(caminho_arquivo: str, nome_arquivo: str):
     }
     
     # Etapa 5: Preparar o nome e o caminho do arquivo de saída JSON
-    nome_base, _ = os.path.splitext(nome_arquivo)
-    nome_saida_json = f"{nome_base}_texto.json"
+    extensao_json = ".jsonl" if FORMATO_SAIDA_TEXTO == "jsonl" else ".json"
+    nome_saida_json = f"{nome_base}_texto{extensao_json}{SUFIXOS_COMPRESSAO.get(COMPRESSAO_SAIDA_TEXTO, '')}"
     caminho_saida_json = os.path.join(PASTA_SAIDA, nome_saida_json)
     
     # Etapa 6: Salvar o dicionário final no novo arquivo JSON
-    salvar_texto_como_json(dados_finais, caminho_saida_json)
+    salvar_texto_como_json(dados_finais, caminho_saida_json, formato=FORMATO_SAIDA_TEXTO, compressao=COMPRESSAO_SAIDA_TEXTO)
 
 def main():
     """
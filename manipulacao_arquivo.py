@@ -4,16 +4,49 @@ Módulo de Manipulação de Arquivos (Extração)
 Este módulo contém as funções responsáveis por ler os diferentes tipos de arquivos
 (.csv, .xlsx, .pdf, .docx) e extrair seu conteúdo bruto.
 Ele separa a lógica de extração de tabelas e de textos em funções diferentes.
+Para arquivos .docx há também um modo de leitura incremental (streaming) do XML,
+que extrai parágrafos e tabelas sem carregar o documento inteiro na memória.
+Para arquivos .pdf, as tabelas de cada página são detectadas (em paralelo entre
+as páginas) e separadas do texto corrido.
+Para arquivos .xlsx, as abas são lidas em modo somente leitura (ou com o motor
+'calamine', quando instalado), podendo ser selecionadas e lidas em paralelo.
 """
 
 import os
+import importlib.util
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+import xml.etree.ElementTree as ET
 import pdfplumber
 import pandas as pd
 from docx import Document
+from openpyxl import load_workbook
+from tratamento_dados import MAPA_COLUNAS, COLUNAS_NUMERICAS, normalizar_nome_coluna
 
-def extrair_tabela(caminho_arquivo: str) -> pd.DataFrame:
+# Namespace XML usado pelo Word dentro de 'word/document.xml'
+NAMESPACE_WORD = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+TAG_PARAGRAFO = NAMESPACE_WORD + "p"
+TAG_TEXTO = NAMESPACE_WORD + "t"
+TAG_TABULACAO = NAMESPACE_WORD + "tab"
+TAGS_QUEBRA_LINHA = (NAMESPACE_WORD + "br", NAMESPACE_WORD + "cr")
+TAG_CORPO = NAMESPACE_WORD + "body"
+TAG_TABELA = NAMESPACE_WORD + "tbl"
+TAG_LINHA = NAMESPACE_WORD + "tr"
+TAG_CELULA = NAMESPACE_WORD + "tc"
+
+# PDFs com menos páginas que este limite são processados no próprio processo,
+# pois o custo de iniciar novos processos supera o ganho do paralelismo
+MIN_PAGINAS_PDF_PARALELO = 8
+
+# Número de linhas lidas de cada vez ao percorrer uma aba do Excel em modo somente leitura
+TAMANHO_BLOCO_EXCEL = 50_000
+
+# O motor 'calamine' (pacote opcional python-calamine) lê arquivos Excel muito mais rápido que o openpyxl
+CALAMINE_DISPONIVEL = importlib.util.find_spec("python_calamine") is not None
+
+def extrair_tabela(caminho_arquivo: str, aba: str | int = 0) -> pd.DataFrame:
     """
-    Extrai uma tabela de arquivos .csv ou .xlsx
+    Extrai uma tabela de arquivos .csv ou .xlsx (no Excel, lê a aba indicada; por padrão, a primeira)
     """
     print(f"   - Tentando extrair TABELA de '{os.path.basename(caminho_arquivo)}'...")
     
@@ -27,8 +60,8 @@ def extrair_tabela(caminho_arquivo: str) -> pd.DataFrame:
             # Se for CSV, usa a função read_csv do Pandas.
             df = pd.read_csv(caminho_arquivo)
         elif extensao == '.xlsx':
-            # Se for Excel, usa a função read_excel do Pandas.
-            df = pd.read_excel(caminho_arquivo)
+            # Se for Excel, lê a aba em modo somente leitura (ou com o motor 'calamine').
+            df = _ler_aba_excel(caminho_arquivo, aba)
         else:
             # Se a extensão não for suportada para tabelas, informa e retorna None.
             print(f"   - ERRO: Extensão '{extensao}' não é suportada para extração de tabelas.")
@@ -43,6 +76,121 @@ def extrair_tabela(caminho_arquivo: str) -> pd.DataFrame:
         print(f"   - ERRO ao ler o arquivo de tabela: {e}")
         return None
 
+def _converter_tipos_declarados(dados: pd.DataFrame, colunas: list[str] | None = None) -> list[str]:
+    """
+    Converte para número as colunas declaradas como numéricas no esquema de empresas (ou apenas as 'colunas' indicadas).
+    Colunas com valores inválidos são mantidas como estão, para que o pipeline de tratamento as avalie.
+    Retorna as colunas convertidas com sucesso.
+    """
+    if colunas is None:
+        colunas = [coluna for coluna in dados.columns if MAPA_COLUNAS.get(normalizar_nome_coluna(coluna)) in COLUNAS_NUMERICAS]
+
+    convertidas = []
+    for coluna in colunas:
+        try:
+            dados[coluna] = pd.to_numeric(dados[coluna])
+            convertidas.append(coluna)
+        except (ValueError, TypeError):
+            pass
+    return convertidas
+
+def _ler_aba_excel(caminho_arquivo: str, aba: str | int = 0, tamanho_bloco: int = TAMANHO_BLOCO_EXCEL) -> pd.DataFrame:
+    """
+    Lê uma aba de um arquivo Excel, convertendo os tipos declarados durante a leitura
+    """
+    if CALAMINE_DISPONIVEL:
+        # O 'calamine' lê a aba inteira de uma vez, mas muito mais rápido que o openpyxl
+        dados = pd.read_excel(caminho_arquivo, sheet_name=aba, engine="calamine")
+        _converter_tipos_declarados(dados)
+        return dados
+
+    # 'read_only=True' faz o openpyxl ler as linhas sob demanda, sem carregar a planilha inteira
+    # 'data_only=True' traz o valor calculado das fórmulas, e não a fórmula em si
+    livro = load_workbook(caminho_arquivo, read_only=True, data_only=True)
+    try:
+        planilha = livro.worksheets[aba] if isinstance(aba, int) else livro[aba]
+        linhas = planilha.iter_rows(values_only=True)
+
+        # A primeira linha da aba é o cabeçalho
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return pd.DataFrame()
+        cabecalho = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(cabecalho)]
+
+        # Lê as linhas em blocos, convertendo os tipos de cada bloco assim que ele é montado.
+        # O primeiro bloco define quais colunas são numéricas; os seguintes só tentam converter essas colunas
+        blocos = []
+        bloco_atual = []
+        colunas_numericas = None
+        for linha in linhas:
+            # Ignora linhas totalmente vazias (comuns no fim das abas)
+            if all(valor is None for valor in linha):
+                continue
+            bloco_atual.append(linha)
+            if len(bloco_atual) >= tamanho_bloco:
+                bloco = pd.DataFrame(bloco_atual, columns=cabecalho)
+                colunas_numericas = _converter_tipos_declarados(bloco, colunas_numericas)
+                blocos.append(bloco)
+                bloco_atual = []
+        if bloco_atual or not blocos:
+            bloco = pd.DataFrame(bloco_atual, columns=cabecalho)
+            _converter_tipos_declarados(bloco, colunas_numericas)
+            blocos.append(bloco)
+    finally:
+        # No modo somente leitura o arquivo fica aberto até o livro ser fechado
+        livro.close()
+
+    # Se uma coluna falhar em um bloco posterior, ela fica com números e textos misturados,
+    # que o pipeline de tratamento converte de qualquer forma
+    return pd.concat(blocos, ignore_index=True)
+
+def listar_abas_excel(caminho_arquivo: str) -> list[str]:
+    """
+    Retorna os nomes das abas de um arquivo Excel, sem ler o conteúdo delas
+    """
+    livro = load_workbook(caminho_arquivo, read_only=True)
+    try:
+        return list(livro.sheetnames)
+    finally:
+        livro.close()
+
+def extrair_abas_excel(caminho_arquivo: str, abas: list[str] = None, max_processos: int = None) -> dict[str, pd.DataFrame]:
+    """
+    Extrai várias abas de um arquivo Excel (todas, por padrão), lendo cada aba em um processo separado
+    """
+    print(f"   - Tentando extrair TABELAS das abas de '{os.path.basename(caminho_arquivo)}'...")
+
+    try:
+        abas_disponiveis = listar_abas_excel(caminho_arquivo)
+        if abas is None:
+            abas = abas_disponiveis
+        else:
+            # Ignora (com aviso) as abas pedidas que não existem no arquivo
+            for aba in abas:
+                if aba not in abas_disponiveis:
+                    print(f"   - AVISO: Aba '{aba}' não encontrada no arquivo.")
+            abas = [aba for aba in abas if aba in abas_disponiveis]
+
+        num_processos = min(max_processos or os.cpu_count() or 1, len(abas))
+
+        tabelas = {}
+        if num_processos <= 1:
+            for aba in abas:
+                tabelas[aba] = _ler_aba_excel(caminho_arquivo, aba)
+        else:
+            # Cada processo abre o próprio arquivo e lê uma aba
+            with ProcessPoolExecutor(max_workers=num_processos) as executor:
+                tarefas = {aba: executor.submit(_ler_aba_excel, caminho_arquivo, aba) for aba in abas}
+                for aba, tarefa in tarefas.items():
+                    tabelas[aba] = tarefa.result()
+
+    except Exception as e:
+        print(f"   - ERRO ao ler o arquivo Excel: {e}")
+        return {}
+
+    print(f"     -> {len(tabelas)} aba(s) extraída(s) com sucesso.")
+    return tabelas
+
 def extrair_texto(caminho_arquivo: str) -> list[str]:
     """
     Extrai o texto corrido de arquivos .pdf ou .docx, parágrafo por parágrafo
@@ -103,4 +251,291 @@ def extrair_texto(caminho_arquivo: str) -> list[str]:
     except Exception as e:
         # Se qualquer erro ocorrer durante o processo, imprime a mensagem e retorna None.
         print(f"   - ERRO ao extrair texto do arquivo: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def iterar_docx_streaming(caminho_arquivo: str):
+    """
+    Percorre o XML de um .docx de forma incremental, gerando parágrafos, linhas de tabela
+    e um aviso de fim de cada tabela
+    """
+    # Cada tabela aberta (inclusive tabelas aninhadas) tem seu próprio estado na pilha
+    pilha_tabelas = []
+    contador_tabelas = 0
+    # Elemento 'w:body', do qual os filhos já processados são removidos
+    corpo = None
+
+    # O .docx é um arquivo .zip; o conteúdo principal fica em 'word/document.xml'
+    with zipfile.ZipFile(caminho_arquivo) as arquivo_zip:
+        with arquivo_zip.open("word/document.xml") as documento_xml:
+            # 'iterparse' lê o XML aos poucos, sem montar a árvore inteira na memória
+            for evento, elemento in ET.iterparse(documento_xml, events=("start", "end")):
+                if evento == "start":
+                    if corpo is None and elemento.tag == TAG_CORPO:
+                        corpo = elemento
+                    elif elemento.tag == TAG_TABELA:
+                        pilha_tabelas.append({"indice": contador_tabelas, "linha": [], "celula": []})
+                        contador_tabelas += 1
+                    elif elemento.tag == TAG_LINHA and pilha_tabelas:
+                        pilha_tabelas[-1]["linha"] = []
+                    elif elemento.tag == TAG_CELULA and pilha_tabelas:
+                        pilha_tabelas[-1]["celula"] = []
+                    continue
+
+                if elemento.tag == TAG_PARAGRAFO:
+                    # Junta os trechos de texto, as tabulações e as quebras de linha do parágrafo
+                    partes = []
+                    for filho in elemento.iter():
+                        if filho.tag == TAG_TEXTO and filho.text:
+                            partes.append(filho.text)
+                        elif filho.tag == TAG_TABULACAO:
+                            partes.append("\t")
+                        elif filho.tag in TAGS_QUEBRA_LINHA:
+                            partes.append("\n")
+                    texto = "".join(partes)
+
+                    # Parágrafos dentro de tabelas fazem parte do texto da célula
+                    if pilha_tabelas:
+                        pilha_tabelas[-1]["celula"].append(texto)
+                    else:
+                        yield ("paragrafo", texto)
+                    # Libera da memória o conteúdo já processado
+                    elemento.clear()
+
+                elif elemento.tag == TAG_CELULA and pilha_tabelas:
+                    tabela = pilha_tabelas[-1]
+                    tabela["linha"].append("\n".join(tabela["celula"]).strip())
+                    elemento.clear()
+
+                elif elemento.tag == TAG_LINHA and pilha_tabelas:
+                    tabela = pilha_tabelas[-1]
+                    yield ("linha_tabela", tabela["indice"], tabela["linha"])
+                    elemento.clear()
+
+                elif elemento.tag == TAG_TABELA and pilha_tabelas:
+                    tabela = pilha_tabelas.pop()
+                    yield ("fim_tabela", tabela["indice"])
+                    elemento.clear()
+
+                # 'clear' esvazia o elemento, mas ele continua preso ao 'w:body'; removendo os filhos
+                # do corpo já processados, a memória usada não cresce com o tamanho do documento
+                if corpo is not None and len(corpo) and corpo[-1] is elemento:
+                    del corpo[-1]
+
+
+def linhas_para_dataframe(linhas: list[list[str]]) -> pd.DataFrame:
+    """
+    Monta um DataFrame a partir das linhas de uma tabela, usando a primeira linha como cabeçalho
+    """
+    # Descarta linhas totalmente vazias
+    linhas_validas = []
+    for linha in linhas:
+        if any(celula and str(celula).strip() for celula in linha):
+            linhas_validas.append(linha)
+
+    # Uma tabela precisa de pelo menos um cabeçalho e uma linha de dados
+    if len(linhas_validas) < 2:
+        return None
+
+    cabecalho = []
+    for celula in linhas_validas[0]:
+        cabecalho.append(str(celula).strip() if celula is not None else "")
+    num_colunas = len(cabecalho)
+
+    # Ajusta cada linha ao número de colunas do cabeçalho (células mescladas geram linhas irregulares)
+    dados = []
+    for linha in linhas_validas[1:]:
+        linha = list(linha)[:num_colunas]
+        linha += [None] * (num_colunas - len(linha))
+        dados.append(linha)
+
+    return pd.DataFrame(dados, columns=cabecalho)
+
+
+def extrair_conteudo_docx(caminho_arquivo: str, incluir_tabelas: bool = True) -> tuple[list[str], list[pd.DataFrame]]:
+    """
+    Extrai, em uma única leitura incremental, os parágrafos e as tabelas de um arquivo .docx
+    """
+    print(f"   - Tentando extrair TEXTO e TABELAS de '{os.path.basename(caminho_arquivo)}' (modo streaming)...")
+
+    paragrafos_filtrados = []
+    linhas_por_tabela = {} # Guarda as linhas das tabelas ainda abertas, pelo índice da tabela
+    tabelas_por_indice = {} # Tabelas já convertidas em DataFrame, pelo índice da tabela
+
+    try:
+        for item in iterar_docx_streaming(caminho_arquivo):
+            if item[0] == "paragrafo":
+                texto = item[1]
+                # Mesma filtragem de 'extrair_texto': ignora parágrafos vazios ou só com espaços
+                if texto and not texto.isspace():
+                    paragrafos_filtrados.append(texto.strip())
+            elif incluir_tabelas and item[0] == "linha_tabela":
+                _, indice_tabela, linha = item
+                linhas_por_tabela.setdefault(indice_tabela, []).append(linha)
+            elif incluir_tabelas and item[0] == "fim_tabela":
+                # Converte a tabela assim que ela termina, descartando as linhas guardadas
+                tabela = linhas_para_dataframe(linhas_por_tabela.pop(item[1], []))
+                if tabela is not None:
+                    tabelas_por_indice[item[1]] = tabela
+
+    except Exception as e:
+        print(f"   - ERRO ao extrair conteúdo do arquivo: {e}")
+        return None, []
+
+    # Mantém as tabelas na ordem em que aparecem no documento (tabelas aninhadas terminam antes)
+    tabelas = [tabelas_por_indice[indice] for indice in sorted(tabelas_por_indice)]
+
+    if paragrafos_filtrados:
+        print(f"     -> Texto extraído com sucesso. {len(paragrafos_filtrados)} parágrafos encontrados.")
+    else:
+        print("   - AVISO: Nenhum texto foi encontrado no arquivo.")
+        paragrafos_filtrados = None
+
+    if incluir_tabelas:
+        print(f"     -> {len(tabelas)} tabela(s) encontrada(s).")
+
+    return paragrafos_filtrados, tabelas
+
+
+def _fora_das_tabelas(caixas_tabelas: list):
+    """
+    Cria um filtro do pdfplumber que descarta os objetos da página que estão dentro de alguma tabela
+    """
+    def filtro(objeto) -> bool:
+        # Objetos sem coordenadas (ex.: anotações) são mantidos
+        if "x0" not in objeto or "top" not in objeto:
+            return True
+        # Usa o centro do objeto para decidir se ele pertence à tabela
+        centro_x = (objeto["x0"] + objeto["x1"]) / 2
+        centro_y = (objeto["top"] + objeto["bottom"]) / 2
+        for x0, topo, x1, base in caixas_tabelas:
+            if x0 <= centro_x <= x1 and topo <= centro_y <= base:
+                return False
+        return True
+    return filtro
+
+
+def _extrair_paginas_pdf(caminho_arquivo: str, indices_paginas: list[int], incluir_tabelas: bool) -> list[tuple[list[str], list[tuple[int, list[list[str]]]]]]:
+    """
+    Extrai o texto corrido e as tabelas de um grupo de páginas de um PDF.
+    Cada tabela é retornada junto com o índice da página em que foi encontrada.
+    Cada processo abre o próprio PDF, pois os objetos do pdfplumber não podem ser compartilhados entre processos.
+    """
+    resultados = []
+    with pdfplumber.open(caminho_arquivo) as pdf:
+        for indice in indices_paginas:
+            pagina = pdf.pages[indice]
+            pagina_texto = pagina
+            tabelas_pagina = []
+
+            if incluir_tabelas:
+                tabelas_encontradas = pagina.find_tables()
+                for tabela in tabelas_encontradas:
+                    tabelas_pagina.append((indice, tabela.extract()))
+                # Remove as tabelas do texto, para que não virem "parágrafos" embaralhados
+                if tabelas_encontradas:
+                    caixas = [tabela.bbox for tabela in tabelas_encontradas]
+                    pagina_texto = pagina.filter(_fora_das_tabelas(caixas))
+
+            texto_pagina = pagina_texto.extract_text()
+            # Mesma divisão de 'extrair_texto': cada linha da página simula um parágrafo
+            paragrafos_pagina = texto_pagina.split('\n') if texto_pagina else []
+            resultados.append((paragrafos_pagina, tabelas_pagina))
+
+            # Libera os objetos da página já processada
+            pagina.close()
+    return resultados
+
+
+def _combinar_tabelas_pdf(tabelas_brutas: list[tuple[int, list[list[str]]]]) -> list[list[list[str]]]:
+    """
+    Junta as tabelas que continuam na página seguinte, com ou sem repetição do cabeçalho.
+    Só a última tabela de uma página pode continuar na primeira tabela da página seguinte.
+    """
+    def eh_cabecalho(linha) -> bool:
+        # Considera cabeçalho a linha em que pelo menos duas células são colunas conhecidas
+        reconhecidas = 0
+        for celula in linha:
+            if celula and normalizar_nome_coluna(celula) in MAPA_COLUNAS:
+                reconhecidas += 1
+        return reconhecidas >= 2
+
+    tabelas_combinadas = []
+    pagina_anterior = None # Página da tabela bruta anterior
+    for pagina, linhas in tabelas_brutas:
+        # Se a tabela bruta anterior está na página imediatamente antes, ela é a última da sua página
+        # e a atual é a primeira da página seguinte: só nesse caso pode haver continuação
+        continua_pagina_anterior = pagina_anterior is not None and pagina == pagina_anterior + 1
+        if not linhas:
+            # Tabela vazia: não é continuação de nada, e nada continua nela
+            pagina_anterior = None
+            continue
+        pagina_anterior = pagina
+        anterior = tabelas_combinadas[-1] if tabelas_combinadas else None
+        if continua_pagina_anterior and anterior is not None and len(linhas[0]) == len(anterior[0]):
+            if linhas[0] == anterior[0]:
+                # Cabeçalho repetido na página seguinte: mantém só as linhas de dados
+                anterior.extend(linhas[1:])
+                continue
+            if not eh_cabecalho(linhas[0]) and eh_cabecalho(anterior[0]):
+                # Continuação sem cabeçalho de uma tabela do esquema de empresas
+                anterior.extend(linhas)
+                continue
+        tabelas_combinadas.append(list(linhas))
+    return tabelas_combinadas
+
+
+def extrair_conteudo_pdf(caminho_arquivo: str, incluir_tabelas: bool = True, max_processos: int = None) -> tuple[list[str], list[pd.DataFrame]]:
+    """
+    Extrai os parágrafos e as tabelas de um arquivo .pdf, processando as páginas em paralelo
+    """
+    print(f"   - Tentando extrair TEXTO e TABELAS de '{os.path.basename(caminho_arquivo)}'...")
+
+    try:
+        with pdfplumber.open(caminho_arquivo) as pdf:
+            num_paginas = len(pdf.pages)
+
+        num_processos = max_processos or os.cpu_count() or 1
+        num_processos = min(num_processos, num_paginas)
+
+        if num_processos <= 1 or num_paginas < MIN_PAGINAS_PDF_PARALELO:
+            resultados = _extrair_paginas_pdf(caminho_arquivo, list(range(num_paginas)), incluir_tabelas)
+        else:
+            # Divide as páginas em blocos contíguos, um por processo, preservando a ordem
+            tamanho_bloco = -(-num_paginas // num_processos)
+            blocos = [list(range(inicio, min(inicio + tamanho_bloco, num_paginas)))
+                      for inicio in range(0, num_paginas, tamanho_bloco)]
+            resultados = []
+            with ProcessPoolExecutor(max_workers=num_processos) as executor:
+                tarefas = [executor.submit(_extrair_paginas_pdf, caminho_arquivo, bloco, incluir_tabelas) for bloco in blocos]
+                for tarefa in tarefas:
+                    resultados.extend(tarefa.result())
+
+    except Exception as e:
+        print(f"   - ERRO ao extrair conteúdo do arquivo: {e}")
+        return None, []
+
+    paragrafos_filtrados = []
+    tabelas_brutas = []
+    for paragrafos_pagina, tabelas_pagina in resultados:
+        for p in paragrafos_pagina:
+            if p and not p.isspace():
+                paragrafos_filtrados.append(p.strip())
+        tabelas_brutas.extend(tabelas_pagina)
+
+    # Converte as tabelas (já unidas entre páginas) em DataFrames
+    tabelas = []
+    for linhas in _combinar_tabelas_pdf(tabelas_brutas):
+        tabela = linhas_para_dataframe(linhas)
+        if tabela is not None:
+            tabelas.append(tabela)
+
+    if paragrafos_filtrados:
+        print(f"     -> Texto extraído com sucesso. {len(paragrafos_filtrados)} parágrafos encontrados.")
+    else:
+        print("   - AVISO: Nenhum texto foi encontrado no arquivo.")
+        paragrafos_filtrados = None
+
+    if incluir_tabelas:
+        print(f"     -> {len(tabelas)} tabela(s) encontrada(s).")
+
+    return paragrafos_filtrados, tabelas
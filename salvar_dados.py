@@ -3,15 +3,119 @@ Módulo de Salvamento de Dados (Carregamento)
 
 Este módulo contém as funções para persistir os dados processados em disco.
 Ele lida com o salvamento de dados em forma de tabela, no formato .csv, e dados de texto, no formato .json
+(indentado, compacto ou JSON Lines). Ambos aceitam compressão gzip/zstd opcional.
+As tabelas também podem ser salvas em .parquet, que preserva os tipos compactados das colunas.
+O sumário executivo estruturado também é salvo em .json, ao lado da tabela tratada.
+Os arquivos são gravados primeiro em um arquivo temporário e depois renomeados,
+para que um arquivo parcialmente escrito nunca seja lido.
 """
 
 import pandas as pd
 import json
 import os
+import io
+import gzip
+import hashlib
+import tempfile
+from contextlib import contextmanager
 
-def salvar_tabela_como_csv(dados: pd.DataFrame, caminho_saida: str):
+# A compressão zstd é opcional: só fica disponível se o pacote 'zstandard' estiver instalado
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Sufixo acrescentado ao nome do arquivo para cada tipo de compressão suportado
+SUFIXOS_COMPRESSAO = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+# Formatos de saída aceitos para os dados de texto
+FORMATOS_TEXTO = ("indentado", "compacto", "jsonl")
+
+
+def _validar_compressao(compressao: str):
+    """
+    Verifica se o tipo de compressão pedido é suportado e está disponível
+    """
+    if compressao not in SUFIXOS_COMPRESSAO:
+        raise ValueError(f"Compressão '{compressao}' não suportada. Use uma de: {list(SUFIXOS_COMPRESSAO)}")
+    if compressao == "zstd" and zstandard is None:
+        raise ValueError("Compressão 'zstd' requer o pacote 'zstandard' instalado.")
+
+
+class _SaidaComHash(io.RawIOBase):
+    """
+    Repassa os bytes escritos para o arquivo de destino, atualizando um hash com o que foi gravado
+    """
+    def __init__(self, arquivo, hash_conteudo):
+        self._arquivo = arquivo
+        self._hash = hash_conteudo
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, dados) -> int:
+        self._hash.update(dados)
+        return self._arquivo.write(dados)
+
+
+@contextmanager
+def _escrita_atomica(caminho_saida: str, compressao: str = None, encoding: str = None, hash_conteudo=None):
+    """
+    Escreve em um arquivo temporário na mesma pasta do destino e só o renomeia para o caminho final
+    ao término da escrita, para que um arquivo incompleto nunca seja visto por quem o lê.
+    Se 'hash_conteudo' for informado (ex.: hashlib.sha256()), ele é atualizado com os bytes gravados no disco.
+    """
+    pasta = os.path.dirname(caminho_saida) or "."
+    # O arquivo temporário precisa estar na mesma pasta para que a renomeação seja atômica
+    descritor, caminho_temporario = tempfile.mkstemp(dir=pasta, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(descritor, "wb") as arquivo:
+            # O hash é calculado sobre os bytes que vão para o disco (já comprimidos, se for o caso)
+            base = arquivo
+            if hash_conteudo is not None:
+                base = io.BufferedWriter(_SaidaComHash(arquivo, hash_conteudo))
+
+            if compressao == "gzip":
+                # 'mtime=0' deixa o conteúdo comprimido igual para dados iguais
+                destino = gzip.GzipFile(filename="", fileobj=base, mode="wb", mtime=0)
+            elif compressao == "zstd":
+                destino = zstandard.ZstdCompressor().stream_writer(base, closefd=False)
+            else:
+                destino = base
+
+            if encoding:
+                # Camada de texto por cima do arquivo binário; é desacoplada ao final para não fechá-lo
+                saida = io.TextIOWrapper(destino, encoding=encoding, newline="")
+                yield saida
+                saida.flush()
+                saida.detach()
+            else:
+                yield destino
+
+            # Finaliza a compressão (se houver) e garante que tudo foi gravado no disco
+            if destino is not base:
+                destino.close()
+            base.flush()
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+
+        # 'mkstemp' cria o arquivo visível só para o dono; aplica as permissões usuais de um arquivo de saída
+        os.chmod(caminho_temporario, 0o644)
+        # 'os.replace' substitui o arquivo final de uma só vez, mesmo se ele já existir
+        os.replace(caminho_temporario, caminho_saida)
+
+    except BaseException:
+        # Em caso de falha, descarta o arquivo temporário e mantém o arquivo final anterior intacto
+        if os.path.exists(caminho_temporario):
+            os.remove(caminho_temporario)
+        raise
+
+def salvar_tabela_como_csv(dados: pd.DataFrame, caminho_saida: str, compressao: str = None,
+                           tamanho_bloco: int = None, gerar_checksum: bool = False):
     """
     Salva um DataFrame em um arquivo no formato .csv
+    Compressão opcional ('gzip' ou 'zstd'), escrita em blocos de 'tamanho_bloco' linhas
+    e arquivo auxiliar '.sha256' com o checksum do arquivo gravado.
     """
     # Verifica se os dados estiverem vazios
     if dados is None:
@@ -20,21 +124,65 @@ def salvar_tabela_como_csv(dados: pd.DataFrame, caminho_saida: str):
 
     print(f"   - Salvando tabela tratada em '{caminho_saida}'...")
     try:
+        _validar_compressao(compressao)
+
         # Garante que a pasta de destino exista antes de tentar salvar.
         os.makedirs(os.path.dirname(caminho_saida), exist_ok=True)
-        
-        # 'index=False' impede o Pandas de salvar o índice do DataFrame como uma coluna no CSV
+
+        hash_conteudo = hashlib.sha256() if gerar_checksum else None
+
+        # Escreve em um arquivo temporário e só o renomeia ao final, para que o dashboard
+        # nunca carregue um CSV truncado
         # 'encoding='utf-8-sig'' garante a compatibilidade com acentos e caracteres especiais ao abrir o arquivo no Excel
-        dados.to_csv(caminho_saida, index=False, encoding='utf-8-sig')
+        with _escrita_atomica(caminho_saida, compressao=compressao, encoding='utf-8-sig', hash_conteudo=hash_conteudo) as f:
+            if not tamanho_bloco or len(dados) <= tamanho_bloco:
+                # 'index=False' impede o Pandas de salvar o índice do DataFrame como uma coluna no CSV
+                dados.to_csv(f, index=False)
+            else:
+                # Escreve o DataFrame em fatias; só a primeira leva o cabeçalho
+                for inicio in range(0, len(dados), tamanho_bloco):
+                    bloco = dados.iloc[inicio:inicio + tamanho_bloco]
+                    bloco.to_csv(f, index=False, header=(inicio == 0))
+
+        if hash_conteudo is not None:
+            # Arquivo auxiliar no mesmo formato do comando 'sha256sum', para conferência após a transferência
+            caminho_checksum = f"{caminho_saida}.sha256"
+            with _escrita_atomica(caminho_checksum, encoding='utf-8') as f:
+                f.write(f"{hash_conteudo.hexdigest()}  {os.path.basename(caminho_saida)}\n")
+
         print(f"     -> Tabela salva com sucesso.")
         
     except Exception as e:
         print(f"   - ERRO ao salvar o arquivo CSV: {e}")
 
 
-def salvar_texto_como_json(dados_para_salvar: dict, caminho_saida: str):
+def salvar_tabela_como_parquet(dados: pd.DataFrame, caminho_saida: str):
+    """
+    Salva um DataFrame em um arquivo no formato .parquet, preservando os tipos das colunas
+    (categorias e inteiros compactados), o que o CSV não consegue fazer
+    """
+    if dados is None:
+        print("   - AVISO: Nenhum dado de tabela para salvar.")
+        return
+
+    print(f"   - Salvando tabela tratada em '{caminho_saida}'...")
+    try:
+        os.makedirs(os.path.dirname(caminho_saida), exist_ok=True)
+
+        # Mesma escrita atômica dos outros formatos; o parquet já é comprimido internamente
+        with _escrita_atomica(caminho_saida) as f:
+            dados.to_parquet(f, index=False)
+        print(f"     -> Tabela salva com sucesso.")
+
+    except Exception as e:
+        print(f"   - ERRO ao salvar o arquivo Parquet: {e}")
+
+
+def salvar_texto_como_json(dados_para_salvar: dict, caminho_saida: str, formato: str = "indentado", compressao: str = None):
     """
     Salva um dicionário de dados em um arquivo no formato .json.
+    Formatos: 'indentado' (legível), 'compacto' (sem espaços) ou 'jsonl' (um parágrafo por linha).
+    Compressão opcional: 'gzip' ou 'zstd'.
     """
     # Não faz nada se o dicionário estiver vazio
     if not dados_para_salvar:
@@ -43,16 +191,86 @@ def salvar_texto_como_json(dados_para_salvar: dict, caminho_saida: str):
 
     print(f"   - Salvando dados de texto em '{caminho_saida}'...")
     try:
+        if formato not in FORMATOS_TEXTO:
+            raise ValueError(f"Formato '{formato}' não suportado. Use um de: {list(FORMATOS_TEXTO)}")
+        _validar_compressao(compressao)
+
         # Garante a existência do diretório
         os.makedirs(os.path.dirname(caminho_saida), exist_ok=True)
         
-        # Abre o arquivo em modo de escrita ('w') com a codificação UTF-8.
-        with open(caminho_saida, 'w', encoding='utf-8') as f:
-            # 'json.dump' escreve o dicionário no arquivo.
-            # 'ensure_ascii=False' permite que caracteres acentuados sejam salvos corretamente.
-            # 'indent=4' formata o JSON de forma legível, com 4 espaços de indentação.
-            json.dump(dados_para_salvar, f, ensure_ascii=False, indent=4)
+        # Escreve em um arquivo temporário com a codificação UTF-8 e o renomeia ao final
+        with _escrita_atomica(caminho_saida, compressao=compressao, encoding='utf-8') as f:
+            if formato == "jsonl":
+                _escrever_texto_jsonl(dados_para_salvar, f)
+            elif formato == "compacto":
+                # 'separators' remove os espaços após ',' e ':' para reduzir o tamanho do arquivo
+                json.dump(dados_para_salvar, f, ensure_ascii=False, separators=(',', ':'))
+            else:
+                # 'json.dump' escreve o dicionário no arquivo.
+                # 'ensure_ascii=False' permite que caracteres acentuados sejam salvos corretamente.
+                # 'indent=4' formata o JSON de forma legível, com 4 espaços de indentação.
+                json.dump(dados_para_salvar, f, ensure_ascii=False, indent=4)
         print(f"     -> Arquivo JSON salvo com sucesso.")
         
     except Exception as e:
-        print(f"   - ERRO ao salvar o arquivo JSON: {e}")
\ No newline at end of file
+        print(f"   - ERRO ao salvar o arquivo JSON: {e}")
+
+
+def _escrever_texto_jsonl(dados_para_salvar: dict, arquivo):
+    """
+    Escreve os dados de texto no formato JSON Lines: um registro de cabeçalho com as estatísticas,
+    um registro por parágrafo e um registro de rodapé com o total de parágrafos
+    """
+    paragrafos = dados_para_salvar.get("paragrafos_limpos", [])
+
+    # Cabeçalho: todas as informações do dicionário, exceto os parágrafos
+    cabecalho = {"tipo": "cabecalho"}
+    for chave, valor in dados_para_salvar.items():
+        if chave != "paragrafos_limpos":
+            cabecalho[chave] = valor
+    arquivo.write(json.dumps(cabecalho, ensure_ascii=False, separators=(',', ':')) + "\n")
+
+    # Um parágrafo por linha, permitindo que o arquivo seja lido aos poucos
+    for indice, paragrafo in enumerate(paragrafos):
+        registro = {"tipo": "paragrafo", "indice": indice, "texto": paragrafo}
+        arquivo.write(json.dumps(registro, ensure_ascii=False, separators=(',', ':')) + "\n")
+
+    # Rodapé: permite ao leitor confirmar que o arquivo está completo
+    rodape = {"tipo": "rodape", "total_de_paragrafos": len(paragrafos)}
+    arquivo.write(json.dumps(rodape, ensure_ascii=False, separators=(',', ':')) + "\n")
+
+
+
+def _tabela_para_registros(tabela: pd.DataFrame) -> list[dict]:
+    """
+    Converte um DataFrame em uma lista de dicionários, trocando NaN por None (null no JSON)
+    """
+    return tabela.astype(object).where(tabela.notna(), None).to_dict(orient="records")
+
+
+def salvar_sumario_como_json(sumario: dict, caminho_saida: str):
+    """
+    Salva o sumário executivo estruturado (ver 'sumario.calcular_sumario') em um arquivo .json compacto
+    """
+    if not sumario:
+        print("   - AVISO: Nenhum sumário para salvar.")
+        return
+
+    print(f"   - Salvando sumário executivo em '{caminho_saida}'...")
+    try:
+        os.makedirs(os.path.dirname(caminho_saida), exist_ok=True)
+
+        # As tabelas do sumário viram listas de registros, um por linha
+        dados_para_salvar = {
+            "consolidado": {chave: (None if pd.isna(valor) else valor) for chave, valor in sumario["consolidado"].items()},
+            "por_dimensao": {nome: _tabela_para_registros(tabela) for nome, tabela in sumario["por_dimensao"].items()},
+            "detalhado": _tabela_para_registros(sumario["detalhado"]),
+        }
+
+        with _escrita_atomica(caminho_saida, encoding='utf-8') as f:
+            # 'default=float' converte os números do NumPy que o módulo json não reconhece
+            json.dump(dados_para_salvar, f, ensure_ascii=False, separators=(',', ':'), default=float)
+        print(f"     -> Sumário salvo com sucesso.")
+
+    except Exception as e:
+        print(f"   - ERRO ao salvar o sumário: {e}")
@@ -2,19 +2,134 @@
 Módulo de Geração de Sumário Executivo
 
 Este módulo é responsável por calcular e exibir um resumo dos principais
-indicadores financeiros e operacionais das tabelas tratadas
+indicadores financeiros e operacionais das tabelas tratadas.
+Além dos totais impressos no console, calcula em um único agrupamento os
+indicadores por Empresa, País, Setor e Ano (totais, margem, receita por
+funcionário e variação em relação ao ano anterior), os mesmos exibidos no dashboard.
 """
 
 import pandas as pd
 
-def sumario_executivo(dados: pd.DataFrame):
+# Dimensões pelas quais os indicadores são agrupados
+COLUNAS_DIMENSAO = ['Empresa', 'País', 'Setor', 'Ano']
+
+# Colunas numéricas somadas em cada agrupamento
+COLUNAS_METRICAS = ['Receita Total (receita bruta)', 'Lucro Líquido',
+                    'Custo Operacional (OPEX)', 'Número de Funcionários']
+
+def agregar_base(dados: pd.DataFrame) -> pd.DataFrame:
+    """
+    Soma as métricas no nível mais detalhado (Empresa, País, Setor e Ano) em um único agrupamento.
+    Todos os outros agrupamentos do sumário são derivados desta base, que é bem menor que os dados originais.
+    """
+    dimensoes = [col for col in COLUNAS_DIMENSAO if col in dados.columns]
+    metricas = [col for col in COLUNAS_METRICAS if col in dados.columns]
+
+    # 'observed=True' evita combinações inexistentes quando as dimensões são categóricas
+    agrupado = dados.groupby(dimensoes, observed=True, dropna=False)
+    base = agrupado[metricas].sum()
+    # Número de linhas originais em cada grupo
+    base['Registros'] = agrupado.size()
+    return base.reset_index()
+
+def _calcular_indicadores(totais: pd.DataFrame) -> pd.DataFrame:
+    """
+    Acrescenta os rácios do dashboard (margem, receita e custo por funcionário) a uma tabela de totais
+    """
+    receita = totais.get('Receita Total (receita bruta)')
+    funcionarios = totais.get('Número de Funcionários')
+
+    # Divisões por zero viram NaN, como o "N/A" exibido no dashboard
+    if receita is not None and 'Lucro Líquido' in totais:
+        totais['Margem Líquida'] = totais['Lucro Líquido'] / receita.where(receita > 0)
+    if funcionarios is not None:
+        funcionarios_validos = funcionarios.where(funcionarios > 0)
+        if receita is not None:
+            totais['Receita / Funcionário'] = receita / funcionarios_validos
+        if 'Custo Operacional (OPEX)' in totais:
+            totais['Custo / Funcionário'] = totais['Custo Operacional (OPEX)'] / funcionarios_validos
+    return totais
+
+def _calcular_variacao_anual(base: pd.DataFrame, dimensao: str, metricas: list[str]) -> pd.DataFrame:
+    """
+    Calcula, para cada valor da dimensão e cada ano, a variação das métricas em relação ao ano anterior.
+    Segue a regra do dashboard: compara com o ano anterior disponível nos dados, conta como 0 quando o grupo
+    não tem registros naquele ano, retorna 0 quando o valor anterior é 0 e limita o resultado a ±100%.
+    """
+    chaves = [dimensao, 'Ano'] if dimensao != 'Ano' else ['Ano']
+    totais = base.groupby(chaves, observed=True)[metricas].sum()
+
+    if dimensao == 'Ano':
+        anteriores = totais.shift(1)
+    else:
+        # Uma coluna por ano (preenchendo com 0 os anos sem registro) e deslocamento de uma coluna
+        por_ano = totais.unstack('Ano', fill_value=0)
+        anteriores = por_ano.T.groupby(level=0).shift(1).T.stack('Ano', future_stack=True)
+        # Mantém apenas as combinações que existem nos dados
+        anteriores = anteriores.reindex(totais.index)[metricas]
+
+    variacao = (totais - anteriores) / anteriores.abs()
+    # Sem ano anterior ou com valor anterior 0, a variação é 0 (como em 'calcular_delta' do dashboard)
+    variacao = variacao.where(anteriores.notna() & (anteriores != 0), 0.0).clip(-1, 1)
+    variacao.columns = [f"Variação {col}" for col in metricas]
+    return variacao
+
+def calcular_sumario(base: pd.DataFrame) -> dict:
+    """
+    Monta o sumário estruturado a partir da base agregada (ver 'agregar_base')
+    """
+    metricas = [col for col in COLUNAS_METRICAS if col in base.columns]
+
+    # Totais gerais
+    totais_gerais = base[metricas].sum()
+    # A transposição deixaria todas as colunas como float; as colunas inteiras voltam a ser int64
+    # (a soma pode não caber no tipo compactado), e 'records' preserva o tipo de cada coluna
+    tipos = {col: 'int64' if pd.api.types.is_integer_dtype(base[col]) else 'float64' for col in metricas}
+    totais_gerais = totais_gerais.to_frame().T.astype(tipos)
+    consolidado = _calcular_indicadores(totais_gerais).to_dict('records')[0]
+    if 'Empresa' in base.columns:
+        consolidado['Número de Empresas'] = int(base['Empresa'].nunique())
+    consolidado['Registros'] = int(base['Registros'].sum())
+
+    # Indicadores por dimensão, reagregando a base (a soma de somas parciais é exata)
+    por_dimensao = {}
+    for dimensao in COLUNAS_DIMENSAO:
+        if dimensao not in base.columns:
+            continue
+        totais = base.groupby(dimensao, observed=True)[metricas + ['Registros']].sum()
+        totais = _calcular_indicadores(totais).reset_index()
+        por_dimensao[dimensao] = totais
+
+        # Variação anual de cada valor da dimensão
+        if 'Ano' in base.columns:
+            variacao = _calcular_variacao_anual(base, dimensao, metricas).reset_index()
+            if dimensao == 'Ano':
+                por_dimensao[dimensao] = totais.merge(variacao, on='Ano', how='left')
+            else:
+                # Totais e indicadores de cada valor da dimensão em cada ano, ao lado da variação
+                totais_por_ano = base.groupby([dimensao, 'Ano'], observed=True)[metricas + ['Registros']].sum()
+                totais_por_ano = _calcular_indicadores(totais_por_ano).reset_index()
+                por_dimensao[f"{dimensao} por Ano"] = totais_por_ano.merge(variacao, on=[dimensao, 'Ano'], how='left')
+
+    return {
+        "consolidado": consolidado,
+        "por_dimensao": por_dimensao,
+        "detalhado": base,
+    }
+
+def sumario_executivo(dados: pd.DataFrame, base: pd.DataFrame = None) -> dict:
     """
     Calcula e imprime no console um sumário dos dados.
+    Se 'base' for informada (já agregada, ver 'agregar_base'), os dados originais não são necessários.
+    Retorna o sumário estruturado (ver 'calcular_sumario'), ou None se não for possível calculá-lo.
     """
     # Se não houver dados, imprime uma mensagem e encerra
-    if dados is None or dados.empty:
+    tabela = base if base is not None else dados
+    if tabela is None or tabela.empty:
         print("\n--- Não há dados para gerar o sumário. ---")
-        return
+        return None
+
+    sumario = None
 
     # Imprime um cabeçalho para o sumário
     print("\n" + "="*50)
@@ -28,17 +143,22 @@ def sumario_executivo(dados: pd.DataFrame):
             'Lucro Líquido'
         ]
 
+        # Agrega os dados uma única vez; os totais e indicadores saem desta base
+        if base is None:
+            base = agregar_base(dados)
+        sumario = calcular_sumario(base)
+
         # Verifica se uma coluna esperada (colunas_financeiras) existe no arquivo
         colunas_existentes = []
         for col in colunas_financeiras:
-            if col in dados.columns:
+            if col in base.columns:
                 colunas_existentes.append(col)
-        
-        # Calcula a soma apenas para as colunas que foram encontradas
-        somas = dados[colunas_existentes].sum()
+
+        # Pega as somas apenas para as colunas que foram encontradas
+        somas = pd.Series({col: sumario["consolidado"][col] for col in colunas_existentes})
 
         # Conta o número de valores únicos na coluna 'Empresa'
-        num_empresas = dados['Empresa'].nunique()
+        num_empresas = sumario["consolidado"]["Número de Empresas"]
         
         # Imprime o resumo dos resultados.
         print(f"Indicadores Consolidados para {num_empresas} empresa(s):")
@@ -56,4 +176,6 @@ def sumario_executivo(dados: pd.DataFrame):
     
     finally:
         # Este bloco é sempre executado, imprimindo o rodapé do sumário.
-        print("="*50)
\ No newline at end of file
+        print("="*50)
+
+    return sumario
\ No newline at end of file
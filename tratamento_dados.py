@@ -3,12 +3,144 @@ Módulo de Tratamento de Dados de Tabela
 
 Este módulo contém todas as funções necessárias para limpar e transformar os dados
 extraídos em formato de tabela (DataFrame do Pandas).
-As operações incluem remoção de duplicatas, conversão de tipos,
-tratamento de valores nulos e padronização de textos.
+As operações incluem padronização dos nomes das colunas, remoção de duplicatas,
+conversão de tipos, tratamento de valores nulos, padronização de textos e,
+opcionalmente, a compactação dos tipos para reduzir o uso de memória.
 """
 
+import re
+import unicodedata
 import pandas as pd
 
+# Colunas do esquema de empresas, na ordem em que aparecem nas tabelas tratadas
+COLUNAS_EMPRESA = ['Empresa', 'Ano', 'Receita Total (receita bruta)', 'Lucro Líquido',
+                   'Custo Operacional (OPEX)', 'Número de Funcionários', 'País', 'Setor']
+
+# Colunas do esquema que devem ser numéricas
+COLUNAS_NUMERICAS = ['Ano', 'Receita Total (receita bruta)', 'Lucro Líquido',
+                     'Custo Operacional (OPEX)', 'Número de Funcionários']
+
+# Nomes alternativos (já normalizados) que aparecem em tabelas extraídas de documentos
+APELIDOS_COLUNAS = {
+    'nome da empresa': 'Empresa',
+    'companhia': 'Empresa',
+    'exercicio': 'Ano',
+    'receita total': 'Receita Total (receita bruta)',
+    'receita bruta': 'Receita Total (receita bruta)',
+    'receita': 'Receita Total (receita bruta)',
+    'faturamento': 'Receita Total (receita bruta)',
+    'lucro': 'Lucro Líquido',
+    'custo operacional': 'Custo Operacional (OPEX)',
+    'custos operacionais': 'Custo Operacional (OPEX)',
+    'opex': 'Custo Operacional (OPEX)',
+    'n de funcionarios': 'Número de Funcionários',
+    'no de funcionarios': 'Número de Funcionários',
+    'funcionarios': 'Número de Funcionários',
+    'colaboradores': 'Número de Funcionários',
+    'setor de atuacao': 'Setor',
+}
+
+# Colunas numéricas do esquema que representam contagens e podem ser guardadas como inteiros;
+# as demais (valores monetários) têm tipo fixo em ponto flutuante
+COLUNAS_INTEIRAS = ['Ano', 'Número de Funcionários']
+
+# Colunas de texto com proporção de valores distintos até este limite viram 'category'
+LIMITE_CARDINALIDADE_CATEGORIA = 0.5
+
+def normalizar_nome_coluna(nome: str) -> str:
+    """
+    Gera uma chave de comparação para o nome de uma coluna: sem acentos, em minúsculas e sem pontuação
+    """
+    # 'NFKD' separa as letras dos acentos, que são descartados ao codificar em ASCII
+    nome = unicodedata.normalize('NFKD', str(nome)).encode('ascii', 'ignore').decode('ascii')
+    # Troca qualquer caractere que não seja letra ou número por espaço e normaliza os espaços
+    nome = re.sub(r'[^a-z0-9]+', ' ', nome.lower())
+    return ' '.join(nome.split())
+
+# Mapa de chave normalizada -> nome oficial da coluna, incluindo os próprios nomes oficiais
+MAPA_COLUNAS = {normalizar_nome_coluna(coluna): coluna for coluna in COLUNAS_EMPRESA}
+MAPA_COLUNAS.update(APELIDOS_COLUNAS)
+
+def normalizar_cabecalhos(dados: pd.DataFrame) -> pd.DataFrame:
+    """
+    Renomeia as colunas reconhecidas para os nomes do esquema de empresas
+    """
+    novos_nomes = {}
+    for coluna in dados.columns:
+        nome_oficial = MAPA_COLUNAS.get(normalizar_nome_coluna(coluna))
+        # Renomeia apenas se o nome oficial ainda não estiver sendo usado por outra coluna
+        if nome_oficial and nome_oficial != coluna and nome_oficial not in dados.columns \
+                and nome_oficial not in novos_nomes.values():
+            novos_nomes[coluna] = nome_oficial
+
+    if novos_nomes:
+        print(f"\n---Padronizando nomes de {len(novos_nomes)} coluna(s) ...")
+        dados = dados.rename(columns=novos_nomes)
+
+    return dados
+
+# Símbolos e códigos de moeda removidos dos valores antes da conversão para número
+PADRAO_MOEDA = re.compile(r'(R\$|US\$|\$|€|£|\b(?:EUR|BRL|USD|GBP)\b)', re.IGNORECASE)
+
+def converter_texto_para_numero(valor):
+    """
+    Converte um valor escrito como texto em documentos (ex.: '1.234.567,89', '€ 2.000', '(1.500)')
+    para uma string no formato aceito por 'pd.to_numeric' ('1234567.89', '2000', '-1500').
+    Textos em branco viram None; valores que não são texto, ou que não parecem números, são devolvidos sem alteração.
+    """
+    if not isinstance(valor, str):
+        return valor
+
+    texto = PADRAO_MOEDA.sub('', valor)
+    # Remove espaços (inclusive o espaço não separável, comum em PDFs) usados como separador de milhar
+    texto = re.sub(r'\s+', '', texto.replace('\xa0', ''))
+
+    # Valores entre parênteses são negativos na notação contábil
+    negativo = texto.startswith('(') and texto.endswith(')')
+    if negativo:
+        texto = texto[1:-1]
+    if texto.startswith('-'):
+        negativo = not negativo
+        texto = texto[1:]
+
+    # Células em branco (comuns em tabelas de documentos) são valores ausentes, e não textos inválidos
+    if not texto:
+        return None
+    if not re.fullmatch(r'[\d.,]*\d[\d.,]*', texto):
+        return valor
+
+    if '.' in texto and ',' in texto:
+        # Com os dois separadores, o último a aparecer é o decimal
+        if texto.rfind(',') > texto.rfind('.'):
+            texto = texto.replace('.', '').replace(',', '.')
+        else:
+            texto = texto.replace(',', '')
+    elif ',' in texto:
+        # '1,234,567' usa vírgula como milhar; '1234,56' usa vírgula como decimal
+        if re.fullmatch(r'\d{1,3}(,\d{3})+', texto) and texto.count(',') > 1:
+            texto = texto.replace(',', '')
+        else:
+            texto = texto.replace(',', '.')
+    elif '.' in texto:
+        # Notação usada nos relatórios em português: '2.000' e '1.234.567' usam ponto como milhar
+        if re.fullmatch(r'\d{1,3}(\.\d{3})+', texto):
+            texto = texto.replace('.', '')
+
+    return f"-{texto}" if negativo else texto
+
+def normalizar_valores_numericos(dados: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normaliza os valores escritos como texto (separadores de milhar/decimal e moeda) nas colunas
+    numéricas do esquema, para que não sejam perdidos na conversão de 'converter_tipos_colunas'
+    """
+    for coluna in dados.columns:
+        if MAPA_COLUNAS.get(normalizar_nome_coluna(coluna)) in COLUNAS_NUMERICAS and dados[coluna].dtype == object:
+            # Converte cada valor distinto uma única vez
+            unicos = dados[coluna].dropna().unique()
+            conversoes = {valor: converter_texto_para_numero(valor) for valor in unicos}
+            dados[coluna] = dados[coluna].map(conversoes).where(dados[coluna].notna(), dados[coluna])
+    return dados
+
 def remover_duplicadas(dados: pd.DataFrame) -> pd.DataFrame:
     """
     Verifica e remove linhas duplicadas de um DataFrame.
@@ -34,8 +166,7 @@ def converter_tipos_colunas(dados: pd.DataFrame) -> pd.DataFrame:
     print("\n---Convertendo tipos de dados das colunas ...")
     
     # Lista de colunas que esperamos que sejam numéricas
-    colunas_numericas = ['Ano', 'Receita Total (receita bruta)', 'Lucro Líquido',
-                         'Custo Operacional (OPEX)', 'Número de Funcionários']
+    colunas_numericas = COLUNAS_NUMERICAS
     
     # Varr cada nome de coluna na lista.
     for coluna in colunas_numericas:
@@ -81,13 +212,58 @@ def padronizar_texto(dados: pd.DataFrame) -> pd.DataFrame:
     # Lista de colunas de texto a serem padronizadas.
     colunas_para_padronizar = ['Empresa', 'País', 'Setor']
     for coluna in colunas_para_padronizar:
-        dados[coluna] = dados[coluna].str.title()
+        # Tabelas extraídas de documentos nem sempre trazem todas as colunas esperadas
+        if coluna in dados.columns:
+            dados[coluna] = dados[coluna].str.title()
+        else:
+            print(f"\n---Coluna de texto '{coluna}' não encontrada")
     
     return dados
 
-def pipeline_tratamento(dados: pd.DataFrame) -> pd.DataFrame:
+def medir_memoria(dados: pd.DataFrame) -> int:
+    """
+    Retorna o total de bytes ocupados pelo DataFrame, incluindo o conteúdo dos textos
+    """
+    # 'deep=True' mede o tamanho real das strings, e não apenas dos ponteiros para elas
+    return int(dados.memory_usage(deep=True).sum())
+
+def compactar_tipos(dados: pd.DataFrame, monetario_float32: bool = False) -> pd.DataFrame:
+    """
+    Reduz a memória ocupada pelo DataFrame: textos com poucos valores distintos viram 'category'
+    e as colunas de contagem ('Ano', 'Número de Funcionários') passam para o menor inteiro que comporta os valores.
+    As colunas monetárias ficam sempre em float64 (ou float32, se 'monetario_float32' for True),
+    para que o tipo e o formato do CSV não dependam dos valores de cada arquivo.
+    """
+    print("\n---Compactando tipos de dados das colunas ...")
+    bytes_antes = medir_memoria(dados)
+
+    for coluna in dados.columns:
+        serie = dados[coluna]
+
+        if serie.dtype == object:
+            # Textos repetidos (Empresa, País, Setor) passam a ser guardados uma única vez
+            if len(serie) > 0 and serie.nunique() / len(serie) <= LIMITE_CARDINALIDADE_CATEGORIA:
+                dados[coluna] = serie.astype('category')
+
+        elif coluna in COLUNAS_INTEIRAS and pd.api.types.is_numeric_dtype(serie):
+            # Ex.: 'Ano' e 'Número de Funcionários' cabem em int16 (se não houver nulos nem casas decimais)
+            if pd.api.types.is_integer_dtype(serie) or (serie.notna().all() and (serie % 1 == 0).all()):
+                dados[coluna] = pd.to_numeric(serie, downcast='integer')
+
+        elif coluna in COLUNAS_NUMERICAS and pd.api.types.is_numeric_dtype(serie):
+            # O float32 perde precisão em valores acima de ~16 milhões, por isso só é usado se pedido
+            dados[coluna] = serie.astype('float32' if monetario_float32 else 'float64')
+
+    bytes_depois = medir_memoria(dados)
+    reducao = 1 - bytes_depois / bytes_antes if bytes_antes else 0
+    print(f"\n---Memória: {bytes_antes:,} bytes -> {bytes_depois:,} bytes (redução de {reducao:.1%})")
+
+    return dados
+
+def pipeline_tratamento(dados: pd.DataFrame, compactar: bool = False, monetario_float32: bool = False) -> pd.DataFrame:
     """
     Orquestra a execução de todas as funções de tratamento em sequência.
+    Se 'compactar' for True, os tipos das colunas são compactados ao final (ver 'compactar_tipos').
     """
     # Caso de um DataFrame vazio seja passado
     if dados is None:
@@ -96,10 +272,13 @@ def pipeline_tratamento(dados: pd.DataFrame) -> pd.DataFrame:
     print("\n---Iniciando pipeline de tratamento de dados---")
     
     # Executa cada etapa do tratamento na ordem definida.
-    dados_tratados = converter_tipos_colunas(dados)
+    dados_tratados = normalizar_cabecalhos(dados)
+    dados_tratados = converter_tipos_colunas(dados_tratados)
     dados_tratados = tratar_dados_nulos(dados_tratados)
     dados_tratados = padronizar_texto(dados_tratados)
     dados_tratados = remover_duplicadas(dados_tratados)
+    if compactar:
+        dados_tratados = compactar_tipos(dados_tratados, monetario_float32=monetario_float32)
     
     # Retorna o DataFrame final.
     return dados_tratados
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""
+Módulo de Validação de Dados
+
+Este módulo verifica a qualidade das tabelas extraídas antes do tratamento.
+As regras são declaradas em uma lista de dicionários e cada uma é avaliada como uma
+máscara (verdadeiro/falso) sobre a coluna inteira, sem percorrer as linhas uma a uma.
+As linhas que violam alguma regra são separadas, junto com o nome das regras violadas,
+e o número de violações de cada regra é contabilizado.
+"""
+
+import numpy as np
+import pandas as pd
+from tratamento_dados import COLUNAS_NUMERICAS, normalizar_cabecalhos
+
+# Regras de validação. Tipos suportados:
+# - 'obrigatoria': as colunas precisam existir e estar preenchidas
+# - 'numerico': valores preenchidos precisam ser números (senão seriam trocados por 0 no tratamento)
+# - 'intervalo': valores preenchidos precisam estar entre 'minimo' e 'maximo' (cada limite é opcional)
+# - 'menor_ou_igual': o valor da coluna não pode ser maior que o da coluna de 'referencia';
+#   a referência ausente conta como 0, pois é assim que ela fica depois do tratamento
+REGRAS_VALIDACAO = [
+    {'nome': 'colunas_obrigatorias', 'tipo': 'obrigatoria', 'colunas': ['Empresa', 'Ano']},
+    {'nome': 'valor_numerico', 'tipo': 'numerico', 'colunas': COLUNAS_NUMERICAS},
+    {'nome': 'ano_valido', 'tipo': 'intervalo', 'coluna': 'Ano', 'minimo': 1900, 'maximo': 2100},
+    {'nome': 'receita_nao_negativa', 'tipo': 'intervalo', 'coluna': 'Receita Total (receita bruta)', 'minimo': 0},
+    {'nome': 'opex_nao_negativo', 'tipo': 'intervalo', 'coluna': 'Custo Operacional (OPEX)', 'minimo': 0},
+    {'nome': 'lucro_ate_receita', 'tipo': 'menor_ou_igual', 'coluna': 'Lucro Líquido',
+     'referencia': 'Receita Total (receita bruta)'},
+]
+
+def _avaliar_regra(dados: pd.DataFrame, regra: dict, numericos: dict, exigir_colunas: bool = True) -> np.ndarray:
+    """
+    Retorna a máscara das linhas que violam a regra (True = violou).
+    Se 'exigir_colunas' for False, as colunas obrigatórias ausentes da tabela são ignoradas.
+    """
+    tipo = regra['tipo']
+    num_linhas = len(dados)
+
+    if tipo == 'obrigatoria':
+        mascara = np.zeros(num_linhas, dtype=bool)
+        for coluna in regra['colunas']:
+            if coluna not in dados.columns:
+                if not exigir_colunas:
+                    continue
+                # Sem a coluna, nenhuma linha atende à regra
+                return np.ones(num_linhas, dtype=bool)
+            valores = dados[coluna]
+            vazios = valores.isna().to_numpy()
+            if valores.dtype == object:
+                # Textos só com espaços também contam como vazios. O teste é feito apenas nos
+                # valores distintos (poucos) e levado para as linhas pelos códigos do 'factorize'
+                codigos, unicos = pd.factorize(valores)
+                unicos_vazios = np.array([isinstance(u, str) and not u.strip() for u in unicos] + [False])
+                # Código -1 (valor ausente) aponta para o último item, que é False
+                vazios |= unicos_vazios[codigos]
+            mascara |= vazios
+        return mascara
+
+    if tipo == 'numerico':
+        mascara = np.zeros(num_linhas, dtype=bool)
+        for coluna in regra['colunas']:
+            if coluna in numericos:
+                # Preenchido na origem, mas não convertido para número
+                mascara |= (dados[coluna].notna() & numericos[coluna].isna()).to_numpy()
+        return mascara
+
+    if tipo == 'intervalo':
+        coluna = regra['coluna']
+        if coluna not in numericos:
+            return np.zeros(num_linhas, dtype=bool)
+        valores = numericos[coluna]
+        mascara = np.zeros(num_linhas, dtype=bool)
+        # Comparações com NaN dão False, então valores ausentes não violam a regra
+        if regra.get('minimo') is not None:
+            mascara |= (valores < regra['minimo']).to_numpy()
+        if regra.get('maximo') is not None:
+            mascara |= (valores > regra['maximo']).to_numpy()
+        return mascara
+
+    if tipo == 'menor_ou_igual':
+        coluna, referencia = regra['coluna'], regra['referencia']
+        if coluna not in numericos or referencia not in numericos:
+            return np.zeros(num_linhas, dtype=bool)
+        # A referência ausente vira 0 no tratamento; comparar com NaN daria False e deixaria a linha passar
+        return (numericos[coluna] > numericos[referencia].fillna(0)).to_numpy()
+
+    raise ValueError(f"Tipo de regra '{tipo}' não suportado.")
+
+def validar_dados(dados: pd.DataFrame, regras: list[dict] = None, exigir_colunas: bool = True) -> tuple[pd.DataFrame, pd.DataFrame, dict]:
+    """
+    Aplica as regras de validação e separa as linhas válidas das rejeitadas.
+    Se 'exigir_colunas' for False (tabelas extraídas de documentos, que nem sempre trazem todas as colunas),
+    a falta de uma coluna obrigatória não rejeita a tabela inteira; as demais regras continuam valendo.
+    Retorna (linhas válidas, linhas rejeitadas com a coluna 'Regras Violadas', contadores por regra).
+    """
+    if regras is None:
+        regras = REGRAS_VALIDACAO
+
+    print("\n---Validando a qualidade dos dados ...")
+
+    # As regras usam os nomes oficiais das colunas
+    dados = normalizar_cabecalhos(dados)
+
+    # Converte cada coluna numérica uma única vez; a conversão é reaproveitada por todas as regras
+    numericos = {}
+    for coluna in COLUNAS_NUMERICAS:
+        if coluna in dados.columns:
+            numericos[coluna] = pd.to_numeric(dados[coluna], errors='coerce')
+
+    # Uma máscara por regra, todas avaliadas sobre a tabela inteira
+    mascaras = {}
+    for regra in regras:
+        mascaras[regra['nome']] = _avaliar_regra(dados, regra, numericos, exigir_colunas)
+
+    rejeitar = np.zeros(len(dados), dtype=bool)
+    for mascara in mascaras.values():
+        rejeitar |= mascara
+
+    contadores = {nome: int(mascara.sum()) for nome, mascara in mascaras.items()}
+    contadores['total_de_linhas'] = len(dados)
+    contadores['linhas_rejeitadas'] = int(rejeitar.sum())
+
+    # Linhas rejeitadas mantêm os valores originais, para facilitar a correção na origem
+    rejeitados = dados[rejeitar].copy()
+    if len(rejeitados) > 0:
+        # Cada combinação de regras violadas vira um número (um bit por regra); o texto com os nomes
+        # das regras é montado uma vez por combinação, e não uma vez por linha
+        nomes = list(mascaras)
+        combinacoes = np.zeros(len(rejeitados), dtype=np.int64)
+        for posicao, nome in enumerate(nomes):
+            combinacoes |= mascaras[nome][rejeitar].astype(np.int64) << posicao
+        textos = {}
+        for combinacao in np.unique(combinacoes):
+            textos[combinacao] = ';'.join(nome for posicao, nome in enumerate(nomes) if combinacao >> posicao & 1)
+        rejeitados['Regras Violadas'] = pd.Series(combinacoes, index=rejeitados.index).map(textos)
+
+    # Nas linhas válidas, as colunas numéricas já saem convertidas
+    validos = dados[~rejeitar].copy()
+    for coluna, valores in numericos.items():
+        validos[coluna] = valores[~rejeitar]
+    validos = validos.reset_index(drop=True)
+
+    for nome, total in contadores.items():
+        if nome not in ('total_de_linhas', 'linhas_rejeitadas') and total > 0:
+            print(f"\n---Regra '{nome}': {total} linha(s) com violação")
+    print(f"\n---{contadores['linhas_rejeitadas']} de {contadores['total_de_linhas']} linha(s) rejeitada(s)")
+
+    return validos, rejeitados, contadores